@@ -4,6 +4,7 @@
 """
 
 import streamlit as st
+import time
 from datetime import datetime, date
 import pandas as pd
 
@@ -12,9 +13,17 @@ from components.email_handler import EmailHandler
 from components.ris_parser import RISParser
 from components.sidebar import SidebarPanel
 from components.main_panel import MainPanel
+from components.publication_store import PublicationStore
+from components.filter_index import FilterIndex, filter_signature
+from components.facet_index import FacetIndex
+from components.imap_query import plan_imap_query
+from components.publication_table import build_publication_table, date_summary
 from utils.doi_utils import DOIUtils
 from utils.openalex_utils import OpenAlexUtils
-from config import APP_CONFIG
+from utils.enrichment import EnrichmentJob
+from utils.http_client import set_contact_email
+from utils.date_utils import normalize_email_date, normalize_publication_date, to_timestamp
+from config import APP_CONFIG, ENRICHMENT_CONFIG
 
 # Настройка страницы
 st.set_page_config(
@@ -158,9 +167,16 @@ if "email_handler" not in st.session_state:
 if "ris_parser" not in st.session_state:
     st.session_state.ris_parser = RISParser()
 
+if "store" not in st.session_state:
+    st.session_state.store = PublicationStore()
+
 if "publications" not in st.session_state:
     st.session_state.publications = []
 
+# Версия набора публикаций: увеличивается при каждой замене списка
+if "publications_version" not in st.session_state:
+    st.session_state.publications_version = 0
+
 if "connected" not in st.session_state:
     st.session_state.connected = False
 
@@ -179,7 +195,14 @@ def main():
     if st.session_state.connected:
         folders = email_handler.get_folders()
 
-    sidebar = SidebarPanel(st.session_state.publications)
+    publications = st.session_state.publications
+    sidebar = SidebarPanel(
+        publications,
+        get_publication_table(publications),
+        get_date_summary(publications),
+        get_facet_index(publications),
+        get_filter_index(publications),
+    )
 
     connection_data = sidebar.render_connection_section()
 
@@ -187,6 +210,9 @@ def main():
         with st.spinner("🔄 Подключение к почтовому серверу..."):
             if email_handler.connect(connection_data["email"], connection_data["password"]):
                 st.session_state.connected = True
+                # Адрес для вежливого пула Crossref и OpenAlex, если он не задан в конфигурации
+                set_contact_email(email_handler.email)
+                restore_from_store(email_handler)
                 st.success("✅ Успешно подключен к почте!")
                 st.rerun()
             else:
@@ -199,7 +225,10 @@ def main():
         if st.sidebar.button("🔌 Отключиться"):
             email_handler.disconnect()
             st.session_state.connected = False
-            st.session_state.publications = []
+            job = st.session_state.pop("enrichment_job", None)
+            if job is not None:
+                job.cancel()
+            set_publications([])
             st.rerun()
 
         filters = sidebar.render_filters_section(folders)
@@ -208,113 +237,354 @@ def main():
         if filters.get("load_click"):
             load_emails(email_handler, ris_parser, filters)
 
-        filtered_publications = apply_filters(st.session_state.publications, filters)
+        if sidebar.render_enrichment_section():
+            start_enrichment()
+        poll_enrichment(email_handler)
+
+        filtered_publications, filtered_table = apply_filters(st.session_state.publications, filters)
 
-        sidebar.render_analytics_section(filtered_publications)
+        sidebar.render_analytics_section(filtered_table)
 
         main_panel = MainPanel()
-        main_panel.render(filtered_publications, email_handler)
+        main_panel.render(filtered_publications, email_handler, view_key=filter_signature(filters))
+
+        schedule_enrichment_poll()
     else:
         show_welcome_screen()
 
 
+def restore_from_store(email_handler):
+    """Публикации из локального хранилища доступны сразу после подключения"""
+    try:
+        store = st.session_state.store
+        # Записи, сохраненные до появления date_ts, нормализуются один раз
+        publications = [normalize_publication_date(p) for p in store.load_publications(email_handler.email)]
+        set_publications(publications)
+        email_handler.sync_state = store.load_sync_state(email_handler.email)
+    except Exception as e:
+        st.warning(f"Не удалось прочитать локальное хранилище: {e}")
+
+
+def load_from_store(email_handler, folders):
+    """Сохраненные письма папок из локального хранилища"""
+    try:
+        records = st.session_state.store.load_publications(email_handler.email, folders)
+        return [normalize_publication_date(p) for p in records]
+    except Exception as e:
+        st.warning(f"Не удалось прочитать локальное хранилище: {e}")
+        # Без сохраненных писем следующая загрузка этих папок будет полной
+        for folder in folders:
+            email_handler.sync_state.pop(folder, None)
+        return []
+
+
+def save_to_store(email_handler, folders, publications):
+    """Сохранение новых писем и состояния синхронизации загруженных папок"""
+    try:
+        store = st.session_state.store
+        for folder in folders:
+            mode = email_handler.last_sync.get(folder)
+            if mode not in ("full", "incremental"):
+                continue
+            store.save_folder(
+                email_handler.email,
+                folder,
+                [p for p in publications if p.get("folder") == folder],
+                state=email_handler.sync_state.get(folder),
+                replace=(mode == "full"),
+            )
+    except Exception as e:
+        st.warning(f"Не удалось сохранить письма в локальное хранилище: {e}")
+
+
 def load_emails(email_handler, ris_parser, filters):
     """Загрузка писем с DOI и PDF вложениями"""
-    from datetime import datetime as _dt
-
     try:
         with st.spinner("📧 Загрузка писем с DOI..."):
-            date_from = _dt.combine(filters["date_from"], _dt.min.time()) if filters["date_from"] else None
-            date_to = _dt.combine(filters["date_to"], _dt.max.time()) if filters["date_to"] else None
+            # Период, отправитель, тема и (по флагу) поиск по RIS полям проверяются
+            # сервером; тип и год - локально, после загрузки
+            query = plan_imap_query(filters)
+
+            incremental = filters.get("incremental", False)
+            progress_bar = st.progress(0)
 
-            emails = email_handler.get_emails_with_doi(
+            def on_folder_done(folder, done, total):
+                progress_bar.progress(done / total, text=f"📁 {folder}: папок обработано {done} из {total}")
+
+            emails = email_handler.iter_emails_with_doi(
                 folders=filters["folders"],
-                date_from=date_from,
-                date_to=date_to,
+                query=query,
+                incremental=incremental,
+                prefilter=filters.get("prefilter", True),
+                multi_doi=filters.get("multi_doi", False),
+                on_folder_done=on_folder_done,
             )
 
-            if not emails:
-                st.warning("📭 Не найдено писем с DOI в выбранных папках и периоде")
-                return
-
+            # Письма обрабатываются потоком, по одному; счетчики фасетов
+            # пополняются по мере поступления записей
             publications = []
-            progress_bar = st.progress(0)
+            facets = FacetIndex()
+            status = st.empty()
 
             for i, email in enumerate(emails):
-                progress_bar.progress((i + 1) / len(emails))
-
-                # Обработка RIS данных из текста письма
-                ris_data = ris_parser.parse_ris_from_text(email.get("text", ""))
-                pub_info = ris_parser.extract_publication_info(ris_data)
-
-                # Обновляем информацию о публикации
-                pub_info.update({
-                    "folder": email.get("folder", ""),
-                    "from": email.get("from", ""),
-                    "subject": email.get("subject", ""),
-                    "date": email.get("date", ""),
-                    "uid": email.get("uid", ""),
-                    "text": email.get("text", ""),
-                    "html": email.get("html", ""),
-                    "DO": email.get("doi"),
-                    "pdf_attachments": email.get("pdf_attachments", [])
-                })
-
-                # Добавляем все RIS данные напрямую из email
-                for key, value in email.items():
-                    if key.upper() in ['DO', 'TI', 'AU', 'PY', 'T2', 'VL', 'IS', 'SP', 'EP', 'KW', 'DE', 'AB', 'N2', 'UR', 'L1', 'L2', 'M3', 'TY', 'CR']:
-                        if key.upper() not in pub_info or not pub_info[key.upper()]:
-                            pub_info[key.upper()] = value
-
-                # Дополняем информацию из темы письма и DOI
-                if not pub_info.get("title") and email.get("subject"):
-                    pub_info["title"] = email["subject"]
-                    pub_info["TI"] = email["subject"]
-
-                if not pub_info.get("doi") and email.get("doi"):
-                    pub_info["doi"] = email["doi"]
-                    pub_info["DO"] = email["doi"]
-
-                publications.append(pub_info)
-
-            st.session_state.publications = publications
+                pub = _email_to_publication(email, ris_parser)
+                publications.append(pub)
+                facets.add(pub)
+                if (i + 1) % 25 == 0:
+                    status.caption(f"📨 Обработано писем с DOI: {i + 1}")
+
+            status.empty()
             progress_bar.empty()
+
+            # При инкрементальной загрузке сохраняем уже загруженные письма
+            # из папок, которые не потребовали полной перезагрузки
+            previous = st.session_state.publications
+            kept_positions = []
+            restored = []
+            if incremental:
+                synced = {
+                    folder for folder in filters["folders"]
+                    if email_handler.last_sync.get(folder) in ("incremental", "unchanged")
+                }
+                kept_positions = [i for i, p in enumerate(previous) if p.get("folder") in synced]
+                # Письма папок, ушедшие из сессии при загрузке других папок,
+                # берутся из локального хранилища (до сохранения новых писем)
+                missing = synced - {previous[i].get("folder") for i in kept_positions}
+                if missing:
+                    restored = load_from_store(email_handler, sorted(missing))
+            kept = [previous[i] for i in kept_positions] + restored
+
+            save_to_store(email_handler, filters["folders"], publications)
+
+            if not publications and not kept:
+                st.warning("📭 Не найдено писем с DOI в выбранных папках и периоде")
+                return
+
+            # Фасеты сохраненных писем берутся из прежней таблицы, новых - уже посчитаны
+            combined = FacetIndex.from_table(get_publication_table(previous).iloc[kept_positions])
+            combined.merge(FacetIndex.from_publications(restored))
+            combined.merge(facets)
+
+            new_count = len(publications)
+            publications = kept + publications
+            set_publications(publications)
+            _seed_for_version("facet_index", combined)
             
             # Подсчитываем PDF вложения
             total_pdfs = sum(len(pub.get("pdf_attachments", [])) for pub in publications)
             pdf_info = f" (📄 {total_pdfs} PDF)" if total_pdfs > 0 else ""
             
-            st.success(f"✅ Загружено {len(publications)} писем с DOI{pdf_info}")
+            if incremental and kept:
+                st.success(f"✅ Загружено {len(publications)} писем с DOI, новых: {new_count}{pdf_info}")
+            else:
+                st.success(f"✅ Загружено {len(publications)} писем с DOI{pdf_info}")
 
     except Exception as e:
         st.error(f"❌ Ошибка загрузки писем: {e}")
 
 
-def apply_filters(publications, filters):
-    if not publications:
-        return []
-
-    filtered = publications.copy()
-
-    if filters["types"]:
-        filtered = [p for p in filtered if p.get("type", "") in filters["types"]]
+def _email_to_publication(email, ris_parser):
+    """Преобразование письма с DOI в запись публикации"""
+    # RIS данные текста письма уже разобраны при загрузке
+    ris_data = email.get("ris")
+    if ris_data is None:
+        ris_data = ris_parser.parse_ris_from_text(email.get("text", ""))
+    pub_info = ris_parser.extract_publication_info(ris_data)
+
+    # Дата письма разбирается один раз: datetime с поясом и метка времени
+    email_date = normalize_email_date(email.get("date"))
+
+    # Обновляем информацию о публикации
+    pub_info.update({
+        "folder": email.get("folder", ""),
+        "from": email.get("from", ""),
+        "subject": email.get("subject", ""),
+        "date": email_date,
+        "date_ts": to_timestamp(email_date),
+        "uid": email.get("uid", ""),
+        "uidvalidity": email.get("uidvalidity"),
+        "ref": email.get("ref", 0),
+        "DO": email.get("doi"),
+        "pdf_attachments": email.get("pdf_attachments", [])
+    })
+
+    # Добавляем все RIS данные напрямую из email
+    for key, value in email.items():
+        if key.upper() in ['DO', 'TI', 'AU', 'PY', 'T2', 'VL', 'IS', 'SP', 'EP', 'KW', 'DE', 'AB', 'N2', 'UR', 'L1', 'L2', 'M3', 'TY', 'CR']:
+            if key.upper() not in pub_info or not pub_info[key.upper()]:
+                pub_info[key.upper()] = value
+
+    # Дополняем информацию из темы письма и DOI
+    if not pub_info.get("title") and email.get("subject"):
+        pub_info["title"] = email["subject"]
+        pub_info["TI"] = email["subject"]
+
+    if not pub_info.get("doi") and email.get("doi"):
+        pub_info["doi"] = email["doi"]
+        pub_info["DO"] = email["doi"]
+
+    return pub_info
+
+
+# RIS поля и соответствующие им нормализованные поля публикации
+ENRICH_FIELDS = {
+    "TI": "title", "T2": "journal", "PY": "year", "TY": "type", "AB": "abstract",
+    "VL": "volume", "IS": "issue", "SP": "pages", "PB": "publisher", "UR": "url",
+    "AU": "authors", "KW": "keywords",
+}
+
+
+def start_enrichment():
+    """Запуск фонового обогащения пустых полей публикаций метаданными Crossref и OpenAlex"""
+    if st.session_state.get("enrichment_job") is not None:
+        return
+
+    dois = _publications_by_doi(st.session_state.publications)
+    if not dois:
+        st.warning("Нет публикаций с DOI для обогащения")
+        return
+    st.session_state.enrichment_job = EnrichmentJob(list(dois)).start()
+
+
+def poll_enrichment(email_handler):
+    """
+    Разбор результатов фонового обогащения, полученных с прошлого rerun,
+    и отображение его хода. Не ждет задание: страница отрисовывается
+    полностью, а следующий опрос запускает schedule_enrichment_poll.
+    Остановка устанавливает флаг задания из st.session_state;
+    запросы, уже отправленные движком, завершаются в фоне
+    """
+    job = st.session_state.get("enrichment_job")
+    if job is None:
+        return
+
+    running = job.is_alive()
+    results = job.take_results()
+    if results:
+        publications = st.session_state.publications
+        by_doi = _publications_by_doi(publications)
+        merged = False
+        for doi, ris in results:
+            for pub in by_doi.get(doi, []):
+                if _merge_enrichment(pub, ris):
+                    job.changed.append(pub)
+                    merged = True
+        # Кэши таблицы, фильтров и группировки перестраиваются только при новых данных
+        if merged:
+            set_publications(publications)
+
+    if running:
+        st.button("⏹ Остановить обогащение", key="stop_enrichment", on_click=job.cancel, disabled=job.cancelled)
+        text = "⏹ Остановка обогащения..." if job.cancelled else f"🧬 Обработано DOI: {job.done} из {job.total}"
+        st.progress(job.done / job.total if job.total else 1.0, text=text)
+        return
+
+    del st.session_state.enrichment_job
+
+    if job.changed:
+        try:
+            for folder in {pub.get("folder") for pub in job.changed}:
+                st.session_state.store.save_folder(
+                    email_handler.email, folder, [pub for pub in job.changed if pub.get("folder") == folder]
+                )
+        except Exception as e:
+            st.warning(f"Не удалось сохранить метаданные в локальное хранилище: {e}")
+
+    if job.error is not None:
+        st.error(f"❌ Ошибка обогащения метаданных: {job.error}")
+    elif job.engine.errors:
+        st.warning(f"Не удалось получить метаданные по {len(job.engine.errors)} запросам: {job.engine.errors[0]}")
+    if job.cancelled:
+        st.info(f"⏹ Обогащение остановлено: получено {job.received} DOI, обновлено публикаций: {len(job.changed)}")
+    elif job.error is None:
+        st.success(f"✅ Метаданные получены для {job.received} DOI, обновлено публикаций: {len(job.changed)}")
+
+
+def schedule_enrichment_poll():
+    """Следующий опрос фонового обогащения: rerun после отрисовки страницы"""
+    if st.session_state.get("enrichment_job") is None:
+        return
+    time.sleep(ENRICHMENT_CONFIG["poll_seconds"])
+    st.rerun()
+
+
+def _publications_by_doi(publications):
+    """Публикации по нормализованному DOI"""
+    by_doi = {}
+    for pub in publications:
+        doi = OpenAlexUtils.normalize_doi(pub.get("doi") or pub.get("DO"))
+        if doi:
+            by_doi.setdefault(doi, []).append(pub)
+    return by_doi
+
+
+def _merge_enrichment(pub, ris):
+    """Заполнение пустых полей публикации; True если запись изменилась"""
+    changed = False
+    for tag, value in ris.items():
+        if not value:
+            continue
+        if not pub.get(tag):
+            pub[tag] = value
+            changed = True
+        field = ENRICH_FIELDS.get(tag)
+        if field and not pub.get(field):
+            pub[field] = value
+            changed = True
+    return changed
+
+
+def set_publications(publications):
+    """Замена загруженного набора публикаций с обновлением его версии"""
+    st.session_state.publications = publications
+    st.session_state.publications_version += 1
+
+
+def _cached_for_version(key, build):
+    """Значение, вычисляемое один раз на версию набора публикаций"""
+    version = st.session_state.publications_version
+    cached = st.session_state.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, build())
+        st.session_state[key] = cached
+    return cached[1]
+
+
+def get_publication_table(publications):
+    """Нормализованная колоночная таблица публикаций"""
+    return _cached_for_version("publication_table", lambda: build_publication_table(publications))
+
+
+def get_date_summary(publications):
+    """Границы дат писем считаются один раз на версию набора публикаций"""
+    return _cached_for_version("date_summary", lambda: date_summary(get_publication_table(publications)))
+
+
+def _seed_for_version(key, value):
+    """Значение для текущей версии, уже построенное по ходу загрузки"""
+    st.session_state[key] = (st.session_state.publications_version, value)
+
+
+def get_facet_index(publications):
+    """Счетчики фасетов строятся один раз на версию набора публикаций"""
+    return _cached_for_version("facet_index", lambda: FacetIndex.from_table(get_publication_table(publications)))
 
-    if filters["years"]:
-        filtered = [p for p in filtered if str(p.get("year", "")) in [str(y) for y in filters["years"]]]
 
-    if filters["author_search"]:
-        term = filters["author_search"].lower()
-        filtered = [p for p in filtered if any(term in str(a).lower() for a in p.get("authors", []))]
+def get_filter_index(publications):
+    """Индекс фильтрации строится один раз на версию набора публикаций"""
+    return _cached_for_version("filter_index", lambda: FilterIndex(get_publication_table(publications)))
 
-    if filters["title_search"]:
-        term = filters["title_search"].lower()
-        filtered = [p for p in filtered if term in str(p.get("title", "")).lower()]
 
-    if filters["keywords_search"]:
-        term = filters["keywords_search"].lower()
-        filtered = [p for p in filtered if any(term in str(k).lower() for k in p.get("keywords", []))]
+def apply_filters(publications, filters):
+    """Отфильтрованные публикации и соответствующие им строки таблицы"""
+    table = get_publication_table(publications)
+    if not publications:
+        return [], table
 
-    return filtered
+    positions = get_filter_index(publications).filter(filters)
+    if len(positions) == len(publications):
+        return publications, table
+    return [publications[i] for i in positions], table.iloc[positions]
 
 
 def show_welcome_screen():
@@ -3,19 +3,37 @@
 Адаптировано из Sci.Net.Core
 """
 
+import queue
+import quopri
 import re
 import smtplib
+import threading
 import urllib.parse
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from imap_tools import MailBox, AND, OR
-from bs4 import BeautifulSoup
-from config import EMAIL_CONFIG, DOI_PATTERN, REQUEST_PATTERNS, SCINET_CORE_EMAIL, RIS_TAGS
+from imap_tools.errors import MailboxFetchError
+from imap_tools.utils import check_command_status
+from config import EMAIL_CONFIG, REQUEST_PATTERNS, SCINET_CORE_EMAIL, RIS_TAGS
+from components.message_parser import parse_message, parse_raw_messages, get_pdf_attachments, create_parse_pool
+from components.imap_query import IMAPQuery
+from utils.ris_utils import tokenize_ris, build_ris, add_ris_field
+from utils.doi_matcher import find_doi
 import streamlit as st
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Any, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from collections import OrderedDict, deque
 import base64
 
+# UID письма в ответе FETCH
+UID_RE = re.compile(rb'UID\s+(\d+)')
+
+# Период проверки отмены, пока рабочий поток ждет места в очереди папки, с
+QUEUE_POLL_SECONDS = 0.2
+
+
 class EmailHandler:
     """Класс для работы с электронной почтой"""
 
@@ -25,6 +43,20 @@ class EmailHandler:
         self.email = None
         self.password = None
         self.connected = False
+        # Состояние инкрементальной синхронизации по папкам:
+        # {folder: {"uidvalidity": int, "last_uid": int, "criteria": str}}
+        self.sync_state: Dict[str, Dict[str, Any]] = {}
+        # Результат последней загрузки по папкам: full / incremental / unchanged / error
+        self.last_sync: Dict[str, str] = {}
+        # Пул дополнительных IMAP-соединений для параллельной загрузки папок
+        self._pool: "queue.Queue[MailBox]" = queue.Queue()
+        # LRU-кэш содержимого недавно открытых PDF: {(folder, uidvalidity, uid, part): bytes}
+        self._pdf_cache: "OrderedDict[Tuple[str, Optional[int], str, str], bytes]" = OrderedDict()
+        self._pdf_cache_bytes = 0
+        # Пул процессов для разбора писем (создается при первой загрузке)
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+        # Пул создается из потоков загрузки папок: только под блокировкой
+        self._parse_pool_lock = threading.Lock()
 
     def connect(self, email: str, password: str) -> bool:
         """Подключение к почтовому серверу"""
@@ -55,7 +87,16 @@ class EmailHandler:
                 self.mailbox.logout()
             if self.smtp:
                 self.smtp.quit()
+            self._close_pool()
+            with self._parse_pool_lock:
+                if self._parse_pool is not None:
+                    self._parse_pool.shutdown(cancel_futures=True)
+                    self._parse_pool = None
+            self._pdf_cache.clear()
+            self._pdf_cache_bytes = 0
             self.connected = False
+            self.sync_state = {}
+            self.last_sync = {}
         except Exception as e:
             st.error(f"Ошибка отключения: {e}")
 
@@ -73,173 +114,470 @@ class EmailHandler:
 
     def extract_doi_from_text(self, text: str) -> Optional[str]:
         """Извлечение первого DOI из текста"""
-        if not text:
+        return find_doi(text)
+
+    def _get_pdf_attachments(self, msg, folder: str = "") -> List[Dict[str, any]]:
+        """Метаданные PDF вложений сообщения (см. message_parser.get_pdf_attachments)"""
+        return get_pdf_attachments(msg, folder)
+
+    def get_pdf_attachment(self, attachment: Dict[str, Any]) -> Optional[bytes]:
+        """
+        Загрузка содержимого PDF вложения по его метаданным.
+        Забирается только нужный раздел письма (BODY.PEEK[part]);
+        недавно открытые файлы хранятся в LRU-кэше ограниченного объема.
+        Если UIDVALIDITY папки изменился с момента загрузки письма (ящик
+        перестроен), UID указывает на другое письмо: загрузка отклоняется.
+        """
+        # Совместимость с записями, где PDF уже лежит в base64
+        if attachment.get('data'):
+            return base64.b64decode(attachment['data'])
+
+        if not self.connected:
             return None
 
-        doi_matches = re.findall(DOI_PATTERN, text, re.IGNORECASE)
-        return doi_matches[0] if doi_matches else None
+        key = (attachment.get('folder'), attachment.get('uidvalidity'), str(attachment.get('uid')), attachment.get('part'))
+        if key in self._pdf_cache:
+            self._pdf_cache.move_to_end(key)
+            return self._pdf_cache[key]
 
-    def _get_pdf_attachments(self, msg) -> List[Dict[str, any]]:
-        """Извлечение PDF вложений из сообщения"""
-        pdf_attachments = []
-        
         try:
-            for att in msg.attachments:
-                if att.content_type == 'application/pdf' or att.filename.lower().endswith('.pdf'):
-                    # Кодируем PDF в base64 для передачи через интерфейс
-                    pdf_data = base64.b64encode(att.payload).decode('utf-8')
-                    pdf_attachments.append({
-                        'filename': att.filename,
-                        'size': len(att.payload),
-                        'data': pdf_data,
-                        'content_type': att.content_type
-                    })
+            self.mailbox.folder.set(attachment['folder'])
+            expected = attachment.get('uidvalidity')
+            if expected is not None and self._selected_uidvalidity(attachment['folder']) != expected:
+                st.error(f"Письмо с вложением {attachment.get('filename', '')} изменилось на сервере: "
+                         f"загрузите папку {attachment['folder']} заново")
+                return None
+            typ, data = self.mailbox.client.uid(
+                'FETCH', str(attachment['uid']), f"(BODY.PEEK[{attachment['part']}])"
+            )
+            if typ != 'OK':
+                return None
+            raw = next((item[1] for item in data if isinstance(item, tuple)), None)
+            if raw is None:
+                return None
+
+            encoding = attachment.get('encoding', '')
+            if encoding == 'base64':
+                payload = base64.b64decode(raw)
+            elif encoding == 'quoted-printable':
+                payload = quopri.decodestring(raw)
+            else:
+                payload = raw
         except Exception as e:
-            # Игнорируем ошибки обработки вложений
-            pass
-            
-        return pdf_attachments
+            st.error(f"Ошибка загрузки вложения {attachment.get('filename', '')}: {e}")
+            return None
+
+        self._pdf_cache[key] = payload
+        self._pdf_cache_bytes += len(payload)
+        while self._pdf_cache_bytes > EMAIL_CONFIG["pdf_cache_bytes"] and len(self._pdf_cache) > 1:
+            _, evicted = self._pdf_cache.popitem(last=False)
+            self._pdf_cache_bytes -= len(evicted)
+        return payload
+
+    def _selected_uidvalidity(self, folder: str) -> Optional[int]:
+        """UIDVALIDITY выбранной папки из ответа SELECT (или запросом STATUS)"""
+        _, data = self.mailbox.client.response('UIDVALIDITY')
+        if data and data[0]:
+            return int(data[0])
+        return self.mailbox.folder.status(folder, ['UIDVALIDITY']).get('UIDVALIDITY')
 
     def get_emails_with_doi(self, folders: List[str] = None, 
                            date_from: datetime = None,
-                           date_to: datetime = None) -> List[Dict]:
+                           date_to: datetime = None,
+                           incremental: bool = False,
+                           prefilter: bool = True,
+                           multi_doi: bool = False,
+                           query: Optional[IMAPQuery] = None) -> List[Dict]:
         """
         Получение всех писем содержащих DOI с фильтрацией
+        Список целиком; для больших ящиков используйте iter_emails_with_doi
+        """
+        return list(self.iter_emails_with_doi(folders, date_from, date_to,
+                                              incremental=incremental, prefilter=prefilter,
+                                              multi_doi=multi_doi, query=query))
+
+    def iter_emails_with_doi(self, folders: List[str] = None,
+                             date_from: datetime = None,
+                             date_to: datetime = None,
+                             incremental: bool = False,
+                             prefilter: bool = True,
+                             multi_doi: bool = False,
+                             query: Optional[IMAPQuery] = None,
+                             on_folder_done: Optional[Callable[[str, int, int], None]] = None) -> Iterator[Dict]:
+        """
+        Потоковое получение писем содержащих DOI: письма разбираются и
+        отдаются по одному, в памяти одновременно держится только пачка FETCH.
         Улучшенная обработка RIS данных из тел писем и PDF вложений
+
+        В режиме incremental для каждой папки запоминаются UIDVALIDITY и
+        максимальный просмотренный UID: повторная загрузка забирает только
+        новые письма, а неизменившаяся папка стоит одного запроса STATUS.
+        Итог по папкам сохраняется в self.last_sync.
+
+        С prefilter письма-кандидаты отбираются на сервере (SEARCH BODY "10."),
+        и полные тела с вложениями скачиваются только для них. Если сервер
+        ищет по тексту ненадежно, prefilter=False скачивает все письма
+        периода; папки, загруженные с отбором, при этом загружаются заново.
+
+        Несколько папок загружаются параллельно через пул IMAP-соединений;
+        письма отдаются в порядке папок из folders. on_folder_done(folder,
+        done, total) вызывается в вызывающем потоке по завершении каждой папки.
+
+        С multi_doi из письма-дайджеста отдается отдельная запись на каждый
+        DOI: блоки RIS делятся по границам ER, записи одного письма
+        различаются полем 'ref'.
+
+        query (см. imap_query.plan_imap_query) задает критерии SEARCH:
+        период с включительной конечной датой, отправитель, тема и текст
+        письма. Без query критерии строятся по date_from и date_to.
         """
         if not self.connected:
-            return []
+            return
 
         if folders is None:
             folders = self.get_folders()
 
-        emails_data = []
+        self.last_sync = {}
+
+        # Критерии поиска
+        if query is None:
+            query = IMAPQuery(date_from, date_to)
+
+        if len(folders) > 1 and EMAIL_CONFIG["imap_pool_size"] > 1:
+            yield from self._iter_folders_parallel(folders, query, incremental, prefilter,
+                                                   multi_doi, on_folder_done)
+            return
+
+        for i, folder in enumerate(folders):
+            try:
+                yield from self._iter_folder(self.mailbox, folder, query, incremental, prefilter, multi_doi)
+            except Exception as folder_error:
+                self.last_sync[folder] = 'error'
+                st.warning(f"Ошибка обработки папки {folder}: {folder_error}")
+            if on_folder_done:
+                on_folder_done(folder, i + 1, len(folders))
+
+    def _iter_folders_parallel(self, folders: List[str], query: IMAPQuery,
+                               incremental: bool, prefilter: bool, multi_doi: bool = False,
+                               on_folder_done: Optional[Callable[[str, int, int], None]] = None) -> Iterator[Dict]:
+        """
+        Параллельная загрузка папок; письма отдаются по одному в исходном
+        порядке папок. Каждая папка пишет в свою ограниченную очередь, так что
+        в памяти одновременно не больше folder_queue_size записей на папку.
+        """
+        workers = min(EMAIL_CONFIG["imap_pool_size"], len(folders))
+        queues = [queue.Queue(maxsize=EMAIL_CONFIG["folder_queue_size"]) for _ in folders]
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+        try:
+            # Папки запускаются по порядку, поэтому читаемая папка всегда в работе
+            for folder, out in zip(folders, queues):
+                executor.submit(self._fetch_folder, folder, query, incremental, prefilter, multi_doi, out, stop)
+
+            for i, (folder, out) in enumerate(zip(folders, queues)):
+                while True:
+                    email_data, folder_error = out.get()
+                    if email_data is None:
+                        break
+                    yield email_data
+                if folder_error is not None:
+                    st.warning(f"Ошибка обработки папки {folder}: {folder_error}")
+                if on_folder_done:
+                    on_folder_done(folder, i + 1, len(folders))
+        finally:
+            # Потребитель мог прекратить чтение: рабочие потоки бросают свои папки
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_folder(self, folder: str, query: IMAPQuery, incremental: bool, prefilter: bool,
+                      multi_doi: bool, out: queue.Queue, stop: threading.Event):
+        """
+        Загрузка одной папки на соединении из пула (выполняется в рабочем потоке).
+        Записи кладутся в out по одной; конец папки - пара (None, ошибка или None)
+        """
+        folder_error = None
+        try:
+            mailbox = self._acquire_mailbox()
+        except Exception as e:
+            self.last_sync[folder] = 'error'
+            self._put(out, (None, e), stop)
+            return
+
+        failed = False
+        try:
+            for email_data in self._iter_folder(mailbox, folder, query, incremental, prefilter, multi_doi):
+                if not self._put(out, (email_data, None), stop):
+                    return
+        except Exception as e:
+            self.last_sync[folder] = 'error'
+            failed = True
+            folder_error = e
+        finally:
+            self._release_mailbox(mailbox, failed)
+        self._put(out, (None, folder_error), stop)
+
+    def _put(self, out: queue.Queue, item: Tuple[Optional[Dict], Optional[Exception]],
+             stop: threading.Event) -> bool:
+        """Запись в очередь папки с ожиданием места; False, если загрузка отменена"""
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=QUEUE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-        for folder in folders:
+    def _acquire_mailbox(self) -> MailBox:
+        """
+        Получение свободного соединения из пула или открытие нового.
+        Соединение из пула проверяется командой NOOP: сервер мог его закрыть
+        """
+        while True:
             try:
-                self.mailbox.folder.set(folder)
+                mailbox = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if mailbox.client.noop()[0] == 'OK':
+                    return mailbox
+            except Exception:
+                pass
+            self._logout_quietly(mailbox)
+
+        mailbox = MailBox(EMAIL_CONFIG["imap_server"])
+        mailbox.login(self.email, self.password)
+        return mailbox
+
+    def _release_mailbox(self, mailbox: MailBox, failed: bool = False):
+        """Возврат соединения в пул; соединение, на котором была ошибка, закрывается"""
+        if failed:
+            self._logout_quietly(mailbox)
+            return
+        self._pool.put(mailbox)
 
-                # Строим критерии поиска
-                criteria = []
-                if date_from:
-                    criteria.append(f"SINCE {date_from.strftime('%d-%b-%Y')}")
-                if date_to:
-                    criteria.append(f"BEFORE {date_to.strftime('%d-%b-%Y')}")
+    def _logout_quietly(self, mailbox: MailBox):
+        try:
+            mailbox.logout()
+        except Exception:
+            pass
 
-                # Получаем сообщения
-                messages = list(self.mailbox.fetch(AND(*criteria) if criteria else None))
+    def _close_pool(self):
+        """Закрытие всех соединений пула"""
+        while True:
+            try:
+                mailbox = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._logout_quietly(mailbox)
+
+    def _iter_folder(self, mailbox: MailBox, folder: str, query: IMAPQuery,
+                     incremental: bool, prefilter: bool, multi_doi: bool = False) -> Iterator[Dict]:
+        """Загрузка писем с DOI из одной папки через указанное соединение"""
+        status = mailbox.folder.status(folder, ['UIDVALIDITY', 'UIDNEXT'])
+        uidvalidity = status.get('UIDVALIDITY')
+        uidnext = status.get('UIDNEXT')
+
+        signature = query.signature(multi_doi, prefilter)
+        state = self.sync_state.get(folder) if incremental else None
+        last_uid = 0
+        mode = 'full'
+        if (state and uidvalidity is not None
+                and state['uidvalidity'] == uidvalidity
+                and state['criteria'] == signature):
+            last_uid = state['last_uid']
+            if uidnext is not None and uidnext - 1 <= last_uid:
+                self.last_sync[folder] = 'unchanged'
+                return
+            mode = 'incremental'
+
+        mailbox.folder.set(folder)
+
+        # Получаем сообщения: сначала UID кандидатов, затем тела только для них
+        if EMAIL_CONFIG["parse_workers"] > 0:
+            parsed = self._parse_in_pool(mailbox, folder, query, prefilter, multi_doi, last_uid)
+        else:
+            parsed = self._parse_inline(mailbox, folder, query, prefilter, multi_doi, last_uid)
+        max_uid = last_uid
+
+        for msg_uid, records in parsed:
+            max_uid = max(max_uid, int(msg_uid or 0))
+            for email_data in records:
+                if query.matches(email_data):
+                    email_data['uidvalidity'] = uidvalidity
+                    # Вложения проверяют UIDVALIDITY при загрузке по UID
+                    for attachment in email_data.get('pdf_attachments', []):
+                        attachment['uidvalidity'] = uidvalidity
+                    yield email_data
+
+        if uidvalidity is not None:
+            if uidnext is not None:
+                max_uid = max(max_uid, uidnext - 1)
+            self.sync_state[folder] = {
+                'uidvalidity': uidvalidity,
+                'last_uid': max_uid,
+                'criteria': signature,
+            }
+        self.last_sync[folder] = mode
+
+    def _parse_message(self, msg, folder: str, multi_doi: bool = False) -> List[Dict]:
+        """Разбор письма в записи публикаций (см. message_parser.parse_message)"""
+        return parse_message(msg, folder, multi_doi)
+
+    def _parse_inline(self, mailbox: MailBox, folder: str, query: IMAPQuery, prefilter: bool,
+                      multi_doi: bool, last_uid: int) -> Iterator[Tuple[str, List[Dict]]]:
+        """Разбор писем в потоке загрузки: пары (UID, записи)"""
+        for msg in self._fetch_doi_candidates(mailbox, query, prefilter, last_uid):
+            try:
+                records = self._parse_message(msg, folder, multi_doi)
+            except Exception as msg_error:
+                records = []
+            yield msg.uid, records
 
-                for msg in messages:
+    def _parse_in_pool(self, mailbox: MailBox, folder: str, query: IMAPQuery, prefilter: bool,
+                       multi_doi: bool, last_uid: int) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Разбор писем в пуле процессов: сырые MIME-байты уходят в процессы
+        пачками, пока следующая пачка загружается по сети. Результаты
+        отдаются в порядке UID; в работе не больше двух пачек на процесс.
+        Если пул сломался (процесс разбора упал), пачки разбираются в потоке.
+        """
+        pool = self._get_parse_pool()
+        window = EMAIL_CONFIG["parse_workers"] * 2
+        batch_size = EMAIL_CONFIG["parse_batch_size"]
+        # Пары (задача пула или None для разбора в потоке, пачка писем)
+        pending: "deque[Tuple[Optional[Future], List[Tuple[str, bytes]]]]" = deque()
+
+        for chunk in self._fetch_raw_candidates(mailbox, query, prefilter, last_uid):
+            for start in range(0, len(chunk), batch_size):
+                batch = chunk[start:start + batch_size]
+                future = None
+                if pool is not None:
                     try:
-                        # Получаем текст письма
-                        email_text = msg.text or ""
-                        email_html = msg.html or ""
-                        
-                        if not email_text and email_html:
-                            soup = BeautifulSoup(email_html, 'html.parser')
-                            email_text = soup.get_text()
-
-                        # Ищем DOI
-                        doi = self.extract_doi_from_text(email_text)
-
-                        if doi:
-                            # Извлекаем RIS данные из текста письма
-                            ris_data = self._extract_all_ris_from_text(email_text, email_html)
-                            
-                            # Получаем PDF вложения
-                            pdf_attachments = self._get_pdf_attachments(msg)
-                            
-                            email_data = {
-                                'uid': msg.uid,
-                                'folder': folder,
-                                'from': msg.from_,
-                                'to': msg.to,
-                                'subject': msg.subject,
-                                'date': msg.date,
-                                'doi': doi,
-                                'text': email_text,
-                                'html': email_html,
-                                'pdf_attachments': pdf_attachments  # Добавляем PDF вложения
-                            }
-                            
-                            # Добавляем все найденные RIS данные
-                            email_data.update(ris_data)
-                            emails_data.append(email_data)
-
-                    except Exception as msg_error:
-                        continue
+                        future = pool.submit(parse_raw_messages, batch, folder, multi_doi)
+                    except BrokenProcessPool:
+                        self._discard_parse_pool(pool)
+                        pool = None
+                pending.append((future, batch))
+            # Отдаем готовые результаты, не дожидаясь остальных
+            while pending and (pending[0][0] is None or pending[0][0].done() or len(pending) > window):
+                results, pool = self._batch_results(pool, *pending.popleft(), folder, multi_doi)
+                yield from results
+
+        while pending:
+            results, pool = self._batch_results(pool, *pending.popleft(), folder, multi_doi)
+            yield from results
+
+    def _batch_results(self, pool: Optional[ProcessPoolExecutor], future: Optional[Future],
+                       batch: List[Tuple[str, bytes]], folder: str,
+                       multi_doi: bool) -> Tuple[List[Tuple[str, List[Dict]]], Optional[ProcessPoolExecutor]]:
+        """Результаты пачки и пул для следующих пачек (None после поломки пула)"""
+        if future is not None:
+            try:
+                return future.result(), pool
+            except BrokenProcessPool:
+                self._discard_parse_pool(pool)
+                pool = None
+        return parse_raw_messages(batch, folder, multi_doi), pool
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        with self._parse_pool_lock:
+            if self._parse_pool is None:
+                self._parse_pool = create_parse_pool(EMAIL_CONFIG["parse_workers"])
+            return self._parse_pool
+
+    def _discard_parse_pool(self, pool: Optional[ProcessPoolExecutor]) -> None:
+        """Закрытие сломанного пула; следующая загрузка создаст новый"""
+        if pool is None:
+            return
+        with self._parse_pool_lock:
+            if self._parse_pool is pool:
+                self._parse_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
 
-            except Exception as folder_error:
-                st.warning(f"Ошибка обработки папки {folder}: {folder_error}")
-                continue
+    def _fetch_raw_candidates(self, mailbox: MailBox, query: IMAPQuery, prefilter: bool,
+                              last_uid: int = 0) -> Iterator[List[Tuple[str, bytes]]]:
+        """
+        Загрузка сырых писем-кандидатов текущей папки пачками [(UID, MIME-байты)]
+        без разбора MIME в потоке загрузки (отбор UID как в _fetch_doi_candidates)
+        """
+        uids = self._search_candidates(mailbox, query, prefilter, last_uid)
+
+        bulk_size = EMAIL_CONFIG["fetch_bulk_size"]
+        for start in range(0, len(uids), bulk_size):
+            result = mailbox.client.uid('FETCH', ','.join(uids[start:start + bulk_size]), '(UID BODY[])')
+            check_command_status(result, MailboxFetchError)
+            chunk = []
+            data = result[1]
+            for i, item in enumerate(data):
+                if not isinstance(item, tuple):
+                    continue
+                # UID может прийти как до тела письма, так и после него
+                tail = data[i + 1] if i + 1 < len(data) and isinstance(data[i + 1], bytes) else b''
+                match = UID_RE.search(item[0]) or UID_RE.search(tail)
+                if match:
+                    chunk.append((match.group(1).decode(), item[1]))
+            yield chunk
 
-        return emails_data
+    def _fetch_doi_candidates(self, mailbox: MailBox, query: IMAPQuery, prefilter: bool = True,
+                              last_uid: int = 0):
+        """
+        Двухфазная загрузка писем текущей папки.
+        Фаза 1: серверный поиск UID писем по критериям запроса
+        (см. _search_candidates).
+        Фаза 2: загрузка полных писем только по найденным UID пачками.
+        """
+        bulk_size = EMAIL_CONFIG["fetch_bulk_size"]
+        uids = self._search_candidates(mailbox, query, prefilter, last_uid)
+        for start in range(0, len(uids), bulk_size):
+            chunk = uids[start:start + bulk_size]
+            yield from mailbox.fetch(AND(uid=chunk), bulk=True)
+
+    def _search_candidates(self, mailbox: MailBox, query: IMAPQuery, prefilter: bool,
+                           last_uid: int = 0) -> List[str]:
+        """
+        UID писем-кандидатов текущей папки, новее last_uid.
+        С prefilter отбираются письма, в теле которых есть префикс DOI "10.".
+        Если сервер не поддерживает поиск по телу, отбор идет без него;
+        если отклонен поиск по тексту (или кодировка UTF-8) - только по периоду,
+        а отправитель и тема проверяются локально (IMAPQuery.matches).
+        """
+        uid_range = [f"UID {last_uid + 1}:*"] if last_uid else []
+        criteria = query.criteria + uid_range
+        attempts = []
+        if prefilter:
+            attempts.append((AND(*criteria, body="10."), query.charset))
+        attempts.append((AND(*criteria) if criteria else "ALL", query.charset))
+        if query.has_text:
+            fallback = query.date_criteria + uid_range
+            attempts.append((AND(*fallback) if fallback else "ALL", 'US-ASCII'))
+
+        for i, (search, charset) in enumerate(attempts):
+            try:
+                uids = mailbox.uids(search, charset)
+                break
+            except Exception:
+                if i == len(attempts) - 1:
+                    raise
+        # Диапазон "N:*" всегда возвращает последнее письмо папки
+        return [uid for uid in uids if int(uid) > last_uid]
 
     def _extract_all_ris_from_text(self, text: str, html: str = "") -> Dict[str, any]:
         """
         Извлечение всех RIS данных из текста и HTML письма
         Сохраняем HTML-ссылки в значениях
         """
-        ris_data = {}
-        
-        if not text and not html:
-            return ris_data
-
-        # Паттерн для RIS полей: TAG - VALUE или TAG  - VALUE
-        ris_pattern = r'^([A-Z0-9]{2})\s*-\s*(.+)$'
-        
-        # Обрабатываем оба текста (текст и HTML)
-        texts_to_process = [text]
-        if html and html != text:
-            texts_to_process.append(html)
-
-        for source_text in texts_to_process:
-            lines = source_text.split('\n')
-            current_tag = None
-            current_value = ""
-
-            for line in lines:
-                line = line.strip()
-                
-                # Проверяем начало нового RIS поля
-                match = re.match(ris_pattern, line)
-                if match:
-                    # Сохраняем предыдущее поле если есть
-                    if current_tag:
-                        self._add_ris_field_enhanced(ris_data, current_tag, current_value)
+        ris_data = build_ris(tokenize_ris(text))
 
-                    current_tag, current_value = match.groups()
-                    current_value = current_value.strip()
-                else:
-                    # Продолжение многострочного поля
-                    if current_tag and line:
-                        current_value += " " + line
-
-            # Сохраняем последнее поле
-            if current_tag:
-                self._add_ris_field_enhanced(ris_data, current_tag, current_value)
+        # HTML разбираем, только если он отличается от текста
+        if html and html != text:
+            build_ris(tokenize_ris(html), ris_data)
 
         return ris_data
 
     def _add_ris_field_enhanced(self, ris_data: Dict, tag: str, value: str):
         """Добавление RIS поля в структуру данных с сохранением HTML"""
-        value = value.strip()
-        if not value:
-            return
-
-        # Поля которые могут повторяться
-        multi_fields = ['AU', 'KW', 'DE', 'CR', 'A1', 'A2', 'A3']
-
-        if tag in multi_fields:
-            if tag not in ris_data:
-                ris_data[tag] = []
-            # Не добавляем дубликаты
-            if value not in ris_data[tag]:
-                ris_data[tag].append(value)
-        else:
-            # Для одиночных полей берем последнее значение
-            if tag not in ris_data or len(value) > len(str(ris_data.get(tag, ''))):
-                ris_data[tag] = value
+        add_ris_field(ris_data, tag, value)
 
     def parse_ris_data_from_email(self, email_text: str) -> Dict[str, str]:
         """
@@ -0,0 +1,149 @@
+"""
+Фасеты публикаций Sci.Net.Node для фильтров боковой панели
+Счетчики значение -> количество по типу, году, папке, журналу, авторам и
+ключевым словам пополняются по мере поступления записей; счетчики под
+текущими фильтрами считаются по позициям из FilterIndex без пересмотра записей
+"""
+
+from array import array
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from components.publication_table import facet_values, LIST_COLUMNS
+
+# Фасеты и ключ фильтра, выбор в котором не сужает счетчики самого фасета
+FACETS = {
+    'type': 'types',
+    'year': 'years',
+    'folder': None,
+    'journal': None,
+    'authors': None,
+    'keywords': None,
+}
+
+# Доля выборки, ниже которой счетчики собираются по вхождениям выбранных записей
+SPARSE_RATIO = 8
+
+
+class FacetIndex:
+    """Класс для подсчета значений фасетов по всему набору и его подмножествам"""
+
+    def __init__(self):
+        self.size = 0
+        # Коды значений по фасетам: value -> code и code -> value
+        self.codes: Dict[str, Dict[str, int]] = {facet: {} for facet in FACETS}
+        self.values: Dict[str, List[str]] = {facet: [] for facet in FACETS}
+        # Счетчики по всему набору, индекс - код значения
+        self.totals: Dict[str, array] = {facet: array('i') for facet in FACETS}
+        # Вхождения значений по порядку записей: номер записи и код значения,
+        # _starts - номер первого вхождения каждой записи
+        self._rows: Dict[str, array] = {facet: array('i') for facet in FACETS}
+        self._hits: Dict[str, array] = {facet: array('i') for facet in FACETS}
+        self._starts: Dict[str, array] = {facet: array('i') for facet in FACETS}
+
+    @classmethod
+    def from_publications(cls, publications: Sequence[Dict[str, Any]]) -> "FacetIndex":
+        index = cls()
+        for pub in publications:
+            index.add(pub)
+        return index
+
+    @classmethod
+    def from_table(cls, table: pd.DataFrame) -> "FacetIndex":
+        """Построение по нормализованной таблице публикаций (векторно)"""
+        index = cls()
+        index.size = len(table)
+        for facet in FACETS:
+            column = table[facet]
+            if facet in LIST_COLUMNS:
+                pairs = pd.DataFrame({'row': np.arange(len(column)), 'value': column.to_numpy()}).explode('value')
+            else:
+                pairs = pd.DataFrame({'row': np.arange(len(column)), 'value': column.astype(str).to_numpy()})
+            pairs = pairs[pairs['value'].notna() & (pairs['value'] != '')].drop_duplicates()
+
+            hits, uniques = pd.factorize(pairs['value'].astype(str))
+            index.values[facet] = [str(value) for value in uniques]
+            index.codes[facet] = {value: code for code, value in enumerate(index.values[facet])}
+            index.totals[facet].frombytes(
+                np.bincount(hits, minlength=len(uniques)).astype(np.int32).tobytes()
+            )
+            rows = pairs['row'].to_numpy(dtype=np.int32)
+            index._rows[facet].frombytes(rows.tobytes())
+            index._hits[facet].frombytes(hits.astype(np.int32).tobytes())
+            index._starts[facet].frombytes(
+                np.searchsorted(rows, np.arange(len(column))).astype(np.int32).tobytes()
+            )
+        return index
+
+    def add(self, pub: Dict[str, Any]) -> int:
+        """Добавление записи в конец набора; возвращает ее позицию"""
+        row = self.size
+        for facet, values in facet_values(pub).items():
+            if facet in FACETS:
+                self._starts[facet].append(len(self._hits[facet]))
+                self._add_values(facet, row, values)
+        self.size += 1
+        return row
+
+    def merge(self, other: "FacetIndex"):
+        """Добавление записей другого индекса в конец набора (позиции сдвигаются)"""
+        offset = self.size
+        for facet in FACETS:
+            recode = [self._code(facet, value) for value in other.values[facet]]
+            totals = self.totals[facet]
+            for code, count in enumerate(other.totals[facet]):
+                totals[recode[code]] += count
+            shift = len(self._hits[facet])
+            self._starts[facet].extend(start + shift for start in other._starts[facet])
+            self._rows[facet].extend(row + offset for row in other._rows[facet])
+            self._hits[facet].extend(recode[code] for code in other._hits[facet])
+        self.size += other.size
+
+    def counts(self, facet: str, positions: Optional[Sequence[int]] = None) -> Dict[str, int]:
+        """
+        Счетчики значений фасета: по всему набору (positions=None)
+        или только по записям с указанными позициями
+        """
+        values = self.values[facet]
+        if positions is None:
+            return {values[code]: count for code, count in enumerate(self.totals[facet]) if count}
+
+        selected = np.asarray(positions, dtype=np.intp)
+        hits = np.frombuffer(self._hits[facet], dtype=np.int32)
+        if len(selected) * SPARSE_RATIO < self.size:
+            # Небольшая выборка: собираем только вхождения выбранных записей
+            starts = np.frombuffer(self._starts[facet], dtype=np.int32)
+            ends = np.append(starts[1:], len(hits))
+            lengths = ends[selected] - starts[selected]
+            shifts = np.repeat(starts[selected] - (np.cumsum(lengths) - lengths), lengths)
+            picked = hits[np.arange(int(lengths.sum())) + shifts]
+        else:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[selected] = True
+            rows = np.frombuffer(self._rows[facet], dtype=np.int32)
+            picked = hits[mask[rows]]
+        counted = np.bincount(picked, minlength=len(values))
+        present = counted.nonzero()[0]
+        return dict(zip(map(values.__getitem__, present.tolist()), counted[present].tolist()))
+
+    def _code(self, facet: str, value: str) -> int:
+        codes = self.codes[facet]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[facet])
+            self.values[facet].append(value)
+            self.totals[facet].append(0)
+        return code
+
+    def _add_values(self, facet: str, row: int, values: List[str]):
+        seen = set()
+        for value in values:
+            if not value or value in seen:
+                continue
+            seen.add(value)
+            code = self._code(facet, value)
+            self.totals[facet][code] += 1
+            self._rows[facet].append(row)
+            self._hits[facet].append(code)
@@ -0,0 +1,98 @@
+"""
+Индекс для фильтрации публикаций Sci.Net.Node
+Строится один раз на загруженный набор и переиспользуется при каждом rerun
+"""
+
+from array import array
+from typing import List, Dict, Any, Optional, Iterable
+
+import pandas as pd
+
+# Длина n-грамм для подстрочного поиска
+NGRAM = 3
+
+# Разделитель значений в склеенных строках (не встречается в поисковом запросе)
+SEP = "\x00"
+
+# Ключи фильтров, которые проверяет FilterIndex
+FILTER_FIELDS = ('types', 'years', 'author_search', 'title_search', 'keywords_search')
+
+
+def filter_signature(filters: Dict[str, Any]) -> str:
+    """Подпись активных фильтров: ключ кэшей, зависящих от отфильтрованного набора"""
+    return repr([(key, filters[key]) for key in FILTER_FIELDS if filters.get(key)])
+
+
+class FilterIndex:
+    """Инвертированные индексы по типу/году и n-граммные индексы по авторам, заголовкам, ключевым словам"""
+
+    def __init__(self, table: pd.DataFrame):
+        self.size = len(table)
+        self.by_type: Dict[str, List[int]] = {}
+        self.by_year: Dict[str, List[int]] = {}
+        # Заранее приведенные к нижнему регистру строки по полям
+        self.texts: Dict[str, List[str]] = {'authors': [], 'title': [], 'keywords': []}
+        self.ngrams: Dict[str, Dict[str, array]] = {'authors': {}, 'title': {}, 'keywords': {}}
+
+        for column, index in (('type', self.by_type), ('year', self.by_year)):
+            codes = table[column].cat.codes.to_numpy()
+            for code, value in enumerate(table[column].cat.categories):
+                index[str(value)] = (codes == code).nonzero()[0].tolist()
+
+        for i, (authors, title, keywords) in enumerate(zip(table['authors'], table['title'], table['keywords'])):
+            self._add_text('authors', i, SEP.join(authors).lower())
+            self._add_text('title', i, title.lower())
+            self._add_text('keywords', i, SEP.join(keywords).lower())
+
+    def _add_text(self, field: str, i: int, text: str):
+        self.texts[field].append(text)
+        postings = self.ngrams[field]
+        for gram in {text[j:j + NGRAM] for j in range(len(text) - NGRAM + 1)}:
+            if SEP in gram:
+                continue
+            bucket = postings.get(gram)
+            if bucket is None:
+                bucket = postings[gram] = array('i')
+            bucket.append(i)
+
+    def _match_values(self, index: Dict[str, List[int]], values: Iterable[str]) -> set:
+        result = set()
+        for value in values:
+            result.update(index.get(value, ()))
+        return result
+
+    def _match_substring(self, field: str, term: str, candidates: Optional[set]) -> set:
+        """Позиции публикаций, в поле которых встречается term"""
+        texts = self.texts[field]
+        if len(term) >= NGRAM:
+            postings = self.ngrams[field]
+            buckets = [postings.get(term[j:j + NGRAM]) for j in range(len(term) - NGRAM + 1)]
+            if any(b is None for b in buckets):
+                return set()
+            # Проверяем только публикации из самого редкого n-граммного списка
+            scan = min(buckets, key=len)
+        else:
+            scan = range(self.size) if candidates is None else candidates
+
+        if candidates is not None and len(candidates) < len(scan):
+            scan = candidates
+        return {i for i in scan if term in texts[i] and (candidates is None or i in candidates)}
+
+    def filter(self, filters: Dict[str, Any]) -> List[int]:
+        """Позиции публикаций, удовлетворяющих фильтрам, в исходном порядке"""
+        candidates: Optional[set] = None
+
+        if filters.get("types"):
+            candidates = self._match_values(self.by_type, filters["types"])
+
+        if filters.get("years"):
+            years = self._match_values(self.by_year, (str(y) for y in filters["years"]))
+            candidates = years if candidates is None else candidates & years
+
+        for field, key in (('authors', 'author_search'), ('title', 'title_search'), ('keywords', 'keywords_search')):
+            if filters.get(key):
+                candidates = self._match_substring(field, filters[key].lower(), candidates)
+
+        if candidates is None:
+            return list(range(self.size))
+        return sorted(candidates)
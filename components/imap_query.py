@@ -0,0 +1,123 @@
+"""
+Планировщик IMAP-поиска Sci.Net.Node
+Фильтры боковой панели переводятся в критерии SEARCH там, где сервер
+может их проверить (период, отправитель, тема, текст письма); остальные
+условия проверяются локально после разбора писем
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from imap_tools import AND, OR
+
+# Поиск по полям публикации и части письма, в которых встречается значение:
+# поля RIS берутся из текста письма, заголовок без RIS - из темы письма
+TEXT_PUSHDOWN = {
+    'author_search': ('body',),
+    'title_search': ('body', 'subject'),
+    'keywords_search': ('body',),
+}
+
+
+class IMAPQuery:
+    """
+    Класс запроса загрузки писем: критерии IMAP SEARCH и локальная проверка.
+    Поиск по тексту на сервере только сужает загрузку: точное совпадение
+    по полям публикаций проверяет FilterIndex, тип и год - только локально.
+    """
+
+    def __init__(self, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                 from_search: str = "", subject_search: str = "",
+                 text_filters: Optional[Dict[str, str]] = None):
+        self.date_gte = _as_date(date_from)
+        # Конечная дата включительно: BEFORE следующего дня
+        self.date_lt = _as_date(date_to) + timedelta(days=1) if date_to else None
+        self.from_search = (from_search or "").strip()
+        self.subject_search = (subject_search or "").strip()
+        self.text_filters = {
+            key: term for key, term in (text_filters or {}).items()
+            if key in TEXT_PUSHDOWN and term and term.strip()
+        }
+
+    @property
+    def criteria(self) -> List[str]:
+        """Все критерии, которые проверяет сервер"""
+        criteria = self.date_criteria
+        if self.from_search:
+            criteria.append(str(AND(from_=self.from_search)))
+        if self.subject_search:
+            criteria.append(str(AND(subject=self.subject_search)))
+        for key, term in self.text_filters.items():
+            fields = TEXT_PUSHDOWN[key]
+            if len(fields) == 1:
+                criteria.append(str(AND(**{fields[0]: term})))
+            else:
+                criteria.append(str(OR(**{field: term for field in fields})))
+        return criteria
+
+    @property
+    def date_criteria(self) -> List[str]:
+        """Только период: для серверов, не поддерживающих поиск по тексту"""
+        dates = {}
+        if self.date_gte:
+            dates['date_gte'] = self.date_gte
+        if self.date_lt:
+            dates['date_lt'] = self.date_lt
+        return [str(AND(**dates))] if dates else []
+
+    @property
+    def has_text(self) -> bool:
+        return bool(self.from_search or self.subject_search or self.text_filters)
+
+    @property
+    def charset(self) -> str:
+        """Кодировка SEARCH: UTF-8 нужна только для не-ASCII строк"""
+        return 'US-ASCII' if all(c.isascii() for c in self.criteria) else 'UTF-8'
+
+    def signature(self, multi_doi: bool = False, prefilter: bool = True) -> str:
+        """
+        Критерии в виде строки для состояния инкрементальной синхронизации.
+        Состояние загрузки по первому DOI не подходит для режима дайджестов,
+        а загрузка с отбором на сервере - для загрузки без него
+        """
+        parts = list(self.criteria)
+        if multi_doi:
+            parts.append("[multi-doi]")
+        if not prefilter:
+            parts.append("[no-prefilter]")
+        return " ".join(parts)
+
+    def matches(self, email_data: Dict[str, Any]) -> bool:
+        """
+        Локальная проверка отправителя и темы письма: нужна, если сервер
+        отклонил поиск по тексту или ищет по словам, а не по подстроке
+        """
+        sender = email_data.get('from_full') or email_data.get('from') or ''
+        if self.from_search and self.from_search.lower() not in str(sender).lower():
+            return False
+        if self.subject_search and self.subject_search.lower() not in str(email_data.get('subject') or '').lower():
+            return False
+        return True
+
+
+def plan_imap_query(filters: Dict[str, Any]) -> IMAPQuery:
+    """
+    Запрос загрузки по фильтрам боковой панели. Поиск по авторам, заголовку
+    и ключевым словам уходит на сервер только с флагом server_search
+    """
+    text_filters = {}
+    if filters.get('server_search'):
+        text_filters = {key: filters.get(key) for key in TEXT_PUSHDOWN}
+    return IMAPQuery(
+        date_from=filters.get('date_from'),
+        date_to=filters.get('date_to'),
+        from_search=filters.get('from_search', ""),
+        subject_search=filters.get('subject_search', ""),
+        text_filters=text_filters,
+    )
+
+
+def _as_date(value: Optional[date]) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
@@ -4,14 +4,20 @@
 """
 import re
 import streamlit as st
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Tuple
 import base64
 from html import escape
+from utils.export_utils import export_ris, as_download, GZIP_MIME
 
 BG = "#fff"; TITLE_COLOR = "#1a1a1a"; AUTHOR_COLOR = "#333"; META_COLOR = "#555"; DOI_COLOR = "#1a0dab"; PDF_COLOR = "#0b8043"; HR_COLOR = "#e4e4e4"; BOX_COLOR = "#f8fafc"; INDEX_LABEL_COLOR = "#5f6368"; INDEX_VAL_COLOR = "#2d2d2d"
 
 HREF_PREFIX = 'href='
+BARE_HREF_RE = re.compile(r'(?<!<a )' + re.escape(HREF_PREFIX))
+
+PAGE_SIZES = [10, 25, 50, 100]
+# Метка времени для писем без даты: при сортировке по дате они идут последними
+NO_DATE_TS = -2**63
+SORT_OPTIONS = {"load": "Порядок загрузки", "date": "Дата письма", "year": "Год публикации", "title": "Заголовок"}
 
 EXCLUDE_BRACKET_VALUE_RE = re.compile(r"\[[^\]]*\]")
 STRIP_HTML_TAGS_RE = re.compile(r"<[^>]+>")
@@ -21,8 +27,11 @@ def _add_anchor_prefix(text: str) -> str:
     if text is None:
         return ""
     s = str(text)
-    s = s.replace(HREF_PREFIX, '<a href=')
-    s = s.replace(']', ']</a>')
+    # Разбор HTML (utils/html_text) уже дает полные теги <a href="...">:
+    # дописываются только голые фрагменты href= из текстовой части письма
+    s, count = BARE_HREF_RE.subn('<a href=', s)
+    if count:
+        s = s.replace(']', ']</a>')
     return s
 
 
@@ -42,7 +51,13 @@ def _pdf_link(pdf_data: str, filename: str) -> str:
         return f'<span style="color:{PDF_COLOR};font-weight:700;margin-left:8px;">📄 PDF</span>'
 
 class MainPanel:
-    def render(self, publications: List[Dict[str, Any]], email_handler=None):
+    def render(self, publications: List[Dict[str, Any]], email_handler=None, view_key: str = ""):
+        """
+        view_key - подпись активных фильтров (filter_index.filter_signature):
+        вместе с версией набора публикаций задает ключ кэша группировки
+        """
+        self.email_handler = email_handler
+        self.view_key = view_key
         if not publications:
             st.info("📭 Нет публикаций для отображения"); return
 
@@ -65,15 +80,23 @@ class MainPanel:
                 if st.button("Выгрузить все RIS в .txt", use_container_width=True):
                     self._export_ris_txt(publications)
 
+        # Легкий индекс DOI (позиции писем и ключи сортировки) строится один раз
+        # на версию набора и фильтры; полные группы - только для видимых DOI
+        index = self._doi_index(publications)
+
         # Логика синхронизации master -> items
         if all_checked != st.session_state.select_all:
             st.session_state.select_all = all_checked
             # Обновить все чекбоксы
-            for doi in self._doi_order(publications):
+            for doi in index:
                 st.session_state.selected_pubs[doi] = all_checked
 
+        # Постраничный вывод: отрисовываются только DOI текущей страницы
+        page_dois = self._page_controls(index)
+
         # Отрисовка карточек с чекбоксами слева
-        for i, (doi, data) in enumerate(self._group_by_doi(publications).items()):
+        for i, doi in enumerate(page_dois):
+            data = self._group(publications, doi)
             if doi not in st.session_state.selected_pubs:
                 st.session_state.selected_pubs[doi] = True
 
@@ -96,26 +119,92 @@ class MainPanel:
         # Обновить видимое состояние master чекбокса
         st.session_state["master_cb"] = st.session_state.select_all
 
-    def _doi_order(self, pubs: List[Dict[str, Any]]):
-        order = []
-        for p in pubs:
+    def _page_controls(self, index: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Сортировка, размер страницы и переход к странице; возвращает DOI текущей страницы"""
+        ctrl_cols = st.columns([0.4, 0.3, 0.3])
+        with ctrl_cols[0]:
+            sort_by = st.selectbox("Сортировка", options=list(SORT_OPTIONS), format_func=SORT_OPTIONS.get, key="sort_by")
+        with ctrl_cols[1]:
+            page_size = st.selectbox("На странице", options=PAGE_SIZES, index=1, key="page_size")
+
+        dois = self._sorted_dois(index, sort_by)
+        pages = max(1, (len(dois) + page_size - 1) // page_size)
+        if st.session_state.get("page_number", 1) > pages:
+            st.session_state["page_number"] = pages
+        with ctrl_cols[2]:
+            page = st.number_input(f"Страница (из {pages})", min_value=1, max_value=pages, step=1, key="page_number")
+
+        start = (int(page) - 1) * page_size
+        return dois[start:start + page_size]
+
+    def _sorted_dois(self, index: Dict[str, Dict[str, Any]], sort_by: str) -> List[str]:
+        """DOI в порядке выбранной сортировки"""
+        dois = list(index)
+        if sort_by == 'date':
+            # Метка времени последнего письма посчитана при построении индекса
+            dois.sort(key=lambda d: index[d]['latest_ts'], reverse=True)
+        elif sort_by == 'year':
+            dois.sort(key=lambda d: index[d]['years'][-1] if index[d]['years'] else '', reverse=True)
+        elif sort_by == 'title':
+            dois.sort(key=lambda d: index[d]['title'].lower())
+        return dois
+
+    def _view_cache(self, pubs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Кэш группировки на версию набора публикаций и фильтры: отрисовка,
+        "Все выбраны" и выгрузка используют один и тот же результат
+        """
+        key = (st.session_state.get('publications_version', 0), getattr(self, 'view_key', ""))
+        cached = st.session_state.get('doi_groups_cache')
+        if cached is None or cached[0] != key:
+            cached = (key, {'index': self._index_by_doi(pubs), 'groups': {}})
+            st.session_state['doi_groups_cache'] = cached
+        return cached[1]
+
+    def _doi_index(self, pubs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        return self._view_cache(pubs)['index']
+
+    def _group(self, pubs: List[Dict[str, Any]], doi: str) -> Dict[str, Any]:
+        """Полная группа DOI (с RIS-индексами писем), строится при первом обращении"""
+        cache = self._view_cache(pubs)
+        group = cache['groups'].get(doi)
+        if group is None:
+            group = cache['groups'][doi] = self._build_group(pubs, cache['index'], doi)
+        return group
+
+    def _build_group(self, pubs: List[Dict[str, Any]], index: Dict[str, Dict[str, Any]], doi: str) -> Dict[str, Any]:
+        """Группа DOI без сохранения в кэш представления"""
+        return self._group_by_doi([pubs[i] for i in index[doi]['positions']])[doi]
+
+    def _index_by_doi(self, pubs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Позиции писем по DOI и ключи сортировки, без разбора RIS полей"""
+        index: Dict[str, Dict[str, Any]] = {}
+        for i, p in enumerate(pubs):
             doi = _clean_doi(p.get('doi') or p.get('DO'))
-            if doi: order.append(doi)
-        return order
+            if not doi: continue
+            entry = index.setdefault(doi, {"positions": [], "latest_ts": NO_DATE_TS, "years": [], "title": ""})
+            entry['positions'].append(i)
+            ts = p.get('date_ts')
+            if ts is not None: entry['latest_ts'] = max(entry['latest_ts'], ts)
+            if (py:=p.get('year') or p.get('PY')) and str(py) not in entry['years']: entry['years'].append(str(py))
+            if not entry['title'] and (t:=p.get('title') or p.get('TI') or p.get('subject')): entry['title'] = str(t)
+        return index
 
     def _group_by_doi(self, pubs: List[Dict[str, Any]]):
         groups: Dict[str, Dict[str, Any]] = {}
         for p in pubs:
             doi = _clean_doi(p.get('doi') or p.get('DO'))
             if not doi: continue
-            g = groups.setdefault(doi, {"doi":doi, "titles":[], "years":[], "journals":[], "authors":[], "pdf_attachments":[], "emails":[]})
+            g = groups.setdefault(doi, {"doi":doi, "titles":[], "years":[], "journals":[], "authors":[], "pdf_attachments":[], "emails":[], "latest_ts":NO_DATE_TS})
             if (t:=p.get('title') or p.get('TI') or p.get('subject')): g['titles'].append(str(t))
             if (jr:=p.get('journal') or p.get('T2')): g['journals'].append(str(jr))
             if (py:=p.get('year') or p.get('PY')): g['years'].append(str(py))
             au=p.get('AU') or p.get('authors') or []; au=[au] if isinstance(au,str) else au
             g['authors'].extend([str(a) for a in au if a])
             if p.get('pdf_attachments'): g['pdf_attachments'].extend(p['pdf_attachments'])
-            g['emails'].append({"date":p.get('date'),"order":len(g['emails']),"raw":self._collect_raw_indices(p)})
+            ts = p.get('date_ts'); ts = NO_DATE_TS if ts is None else ts
+            g['latest_ts'] = max(g['latest_ts'], ts)
+            g['emails'].append({"date":p.get('date'),"ts":ts,"order":len(g['emails']),"raw":self._collect_raw_indices(p)})
         for g in groups.values():
             for k in ('titles','years','journals','authors'):
                 seen=set(); uniq=[]
@@ -149,9 +238,11 @@ class MainPanel:
         meta=[]
         if year: meta.append(f'<span class="gs-year">{escape(str(year))}</span>')
         meta.append(f'<span class="gs-doi"><a href="https://doi.org/{doi}" target="_blank">{doi}</a></span>')
-        if pdf_attachments:
+        if pdf_attachments and pdf_attachments[0].get('data'):
             meta.append(_pdf_link(pdf_attachments[0]['data'], pdf_attachments[0]['filename']))
         st.markdown('  ·  '.join(meta), unsafe_allow_html=True)
+        if pdf_attachments and not pdf_attachments[0].get('data'):
+            self._pdf_button(doi, pdf_attachments[0])
         exp_key=f'exp_{doi}'; is_open=st.session_state.get(exp_key, False)
         if st.button('▲' if is_open else '▼', key=f'btn_{doi}', help='Показать/скрыть детали публикации'):
             st.session_state[exp_key]=not is_open; st.rerun()
@@ -161,16 +252,24 @@ class MainPanel:
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
+    def _pdf_button(self, doi:str, attachment:Dict[str,Any]):
+        """PDF загружается с почтового сервера только после нажатия на кнопку"""
+        pdf_key=f'pdf_{doi}'
+        if not st.session_state.get(pdf_key, False):
+            if st.button('📄 PDF', key=f'btn_{pdf_key}', help=f"Загрузить {attachment.get('filename', '')}"):
+                st.session_state[pdf_key]=True; st.rerun()
+            return
+        handler=getattr(self, 'email_handler', None)
+        payload=handler.get_pdf_attachment(attachment) if handler else None
+        if payload is None:
+            st.markdown(f'<span style="color:{PDF_COLOR};font-weight:700;">📄 PDF недоступен</span>', unsafe_allow_html=True)
+            return
+        st.download_button('📄 Скачать PDF', data=payload, file_name=attachment.get('filename') or 'attachment.pdf',
+                           mime='application/pdf', key=f'dl_{pdf_key}')
+
     def _details(self, data:Dict[str,Any]):
         emails=data.get('emails', [])
-        def _key(e):
-            d=e.get('date')
-            try:
-                if isinstance(d,str):
-                    from dateutil import parser; d=parser.parse(d)
-            except Exception: d=None
-            return (d or datetime.min, -e.get('order',0))
-        emails_sorted=sorted(emails, key=_key, reverse=True)
+        emails_sorted=sorted(emails, key=lambda e: (e.get('ts', NO_DATE_TS), -e.get('order',0)), reverse=True)
         rows=[]; seen:Dict[str,set]={}
         for e in emails_sorted:
             for tag,val in e.get('raw', []):
@@ -189,31 +288,38 @@ class MainPanel:
         if not selected:
             st.warning("Не выбрано ни одной публикации для выгрузки")
             return
-        groups = self._group_by_doi(pubs)
-        lines = []
-        for doi, data in groups.items():
-            if doi not in selected:
+        cache = self._view_cache(pubs)
+        index, groups = cache['index'], cache['groups']
+        # Записи пишутся во временный файл по одной, без сборки всего текста;
+        # группы, которых нет в кэше видимой страницы, строятся и сразу отбрасываются
+        compress = st.session_state.get("export_gzip", False)
+        ris_file, _ = export_ris(
+            (self._ris_pairs(groups.get(doi) or self._build_group(pubs, index, doi))
+             for doi in index if doi in selected),
+            compress
+        )
+        st.download_button("Скачать RIS .txt", data=as_download(ris_file),
+                           file_name="export_ris.txt.gz" if compress else "export_ris.txt",
+                           mime=GZIP_MIME if compress else "text/plain")
+
+    def _ris_pairs(self, data: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """Уникальные пары RIS публикации из всех ее писем по порядку появления"""
+        # Собираем все пары из emails.raw
+        all_pairs = []
+        for e in data.get('emails', []):
+            all_pairs.extend(e.get('raw', []))
+        pairs = []
+        seen = set()
+        for tag, val in all_pairs:
+            # Исключаем значения в квадратных скобках и html-скрипты
+            if EXCLUDE_BRACKET_VALUE_RE.search(val):
                 continue
-            # Собираем все пары из emails.raw
-            all_pairs = []
-            for e in data.get('emails', []):
-                all_pairs.extend(e.get('raw', []))
-            # Уникальные строки по порядку появления
-            seen = set()
-            for tag, val in all_pairs:
-                # Исключаем значения в квадратных скобках и html-скрипты
-                if EXCLUDE_BRACKET_VALUE_RE.search(val):
-                    continue
-                # Удаляем html теги целиком
-                clean = STRIP_HTML_TAGS_RE.sub('', val)
-                clean = clean.strip()
-                if not clean:
-                    continue
-                line = f"{tag}  - {clean}"
-                if line not in seen:
-                    seen.add(line)
-                    lines.append(line)
-            # Разделитель между публикациями
-            lines.append("ER  -")
-        content = "\n".join(lines)
-        st.download_button("Скачать RIS .txt", data=content, file_name="export_ris.txt", mime="text/plain")
+            # Удаляем html теги целиком
+            clean = STRIP_HTML_TAGS_RE.sub('', val)
+            clean = clean.strip()
+            if not clean:
+                continue
+            if (tag, clean) not in seen:
+                seen.add((tag, clean))
+                pairs.append((tag, clean))
+        return pairs
@@ -0,0 +1,201 @@
+"""
+Разбор писем Sci.Net.Node в записи публикаций
+Функции уровня модуля: выполняются и в потоке загрузки, и в пуле процессов
+(в процесс уходят сырые MIME-байты, обратно - компактные записи)
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Optional, Any
+
+from imap_tools import MailMessage
+
+from utils.ris_utils import tokenize_ris, build_ris, copy_ris, scan_body, split_ris_records
+from utils.doi_matcher import find_doi, find_all_dois
+from utils.html_text import scan_html
+
+
+def parse_message(msg: MailMessage, folder: str, multi_doi: bool = False,
+                  uid: Optional[str] = None, compact: bool = False) -> List[Dict[str, Any]]:
+    """
+    Разбор письма в записи публикаций; пустой список если в письме нет DOI.
+    Без multi_doi - одна запись по первому DOI, с multi_doi - по записи
+    на каждую ссылку письма-дайджеста. compact=True не включает в записи
+    тексты писем (RIS уже разобран).
+    """
+    uid = uid if uid is not None else msg.uid
+
+    # Получаем текст письма
+    email_text = msg.text or ""
+    email_html = msg.html or ""
+
+    # Один проход по телу: пары RIS с границами ER и все DOI.
+    # Письмо только с HTML разбирается потоково: текст, DOI и строки RIS
+    # (со ссылками <a href>) получаются за один проход по разметке
+    html_pairs = None
+    if email_text:
+        pairs, dois = scan_body(email_text)
+    elif email_html:
+        email_text, pairs, html_pairs, dois = scan_html(email_html, boundaries=True)
+    else:
+        return []
+
+    if compact:
+        fields = _message_fields(msg, uid, folder, None, None)
+    else:
+        fields = _message_fields(msg, uid, folder, email_text, email_html)
+
+    if multi_doi and len(dois) > 1:
+        return _split_references(fields, pairs, dois)
+
+    # Ищем DOI
+    if not dois:
+        return []
+    doi = dois[0]
+
+    # Извлекаем RIS данные: каждое тело письма разбирается один раз,
+    # RIS из текста сохраняется отдельно для extract_publication_info
+    text_ris = build_ris(pairs)
+    ris_data = copy_ris(text_ris)
+    if html_pairs is not None:
+        build_ris(html_pairs, ris_data)
+    elif email_html and email_html != email_text:
+        build_ris(tokenize_ris(email_html), ris_data)
+
+    email_data = fields
+    email_data.update({'doi': doi, 'ris': text_ris})
+
+    # Добавляем все найденные RIS данные
+    email_data.update(ris_data)
+    return [email_data]
+
+
+def parse_raw_messages(items: List[Tuple[str, bytes]], folder: str,
+                       multi_doi: bool = False) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Разбор пачки сырых писем [(uid, MIME-байты)] в компактные записи.
+    Точка входа для пула процессов: ошибка в одном письме не прерывает пачку.
+    """
+    results = []
+    for uid, raw in items:
+        try:
+            records = parse_message(MailMessage.from_bytes(raw), folder, multi_doi, uid=uid, compact=True)
+        except Exception:
+            records = []
+        results.append((uid, records))
+    return results
+
+
+def get_pdf_attachments(msg: MailMessage, folder: str = "", uid: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Метаданные PDF вложений сообщения (без содержимого).
+    Сами файлы загружаются по требованию через EmailHandler.get_pdf_attachment
+    по номеру IMAP-раздела письма.
+    """
+    uid = uid if uid is not None else msg.uid
+    pdf_attachments = []
+
+    try:
+        for section, part in iter_mime_sections(msg.obj):
+            filename = part.get_filename() or ""
+            content_type = part.get_content_type()
+            if content_type == 'application/pdf' or filename.lower().endswith('.pdf'):
+                payload = part.get_payload(decode=True) or b""
+                pdf_attachments.append({
+                    'filename': filename or f"attachment_{section}.pdf",
+                    'size': len(payload),
+                    'content_type': content_type,
+                    'uid': uid,
+                    'folder': folder,
+                    'part': section,
+                    'encoding': (part.get('Content-Transfer-Encoding') or '7bit').strip().lower()
+                })
+    except Exception:
+        # Игнорируем ошибки обработки вложений
+        pass
+
+    return pdf_attachments
+
+
+def iter_mime_sections(part, prefix: str = ""):
+    """Обход листовых MIME-частей с номерами разделов IMAP (1, 2, 2.1, ...)"""
+    if not part.is_multipart():
+        yield (prefix or "1"), part
+        return
+
+    for i, sub in enumerate(part.get_payload(), 1):
+        section = f"{prefix}.{i}" if prefix else str(i)
+        if sub.get_content_type() == 'message/rfc822':
+            for inner in sub.get_payload():
+                if inner.is_multipart():
+                    yield from iter_mime_sections(inner, section)
+                else:
+                    yield f"{section}.1", inner
+        elif sub.is_multipart():
+            yield from iter_mime_sections(sub, section)
+        else:
+            yield section, sub
+
+
+def create_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Пул процессов для разбора писем. Используется spawn: сервер Streamlit
+    многопоточный, и fork его процесса небезопасен.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _split_references(fields: Dict[str, Any], pairs: List[Tuple[str, str]], dois: List[str]) -> List[Dict[str, Any]]:
+    """
+    Записи по ссылкам письма-дайджеста: сначала блоки RIS (TY ... ER)
+    со своим DOI (поле DO), затем DOI свободного текста. DOI, встречающиеся
+    внутри блоков (списки литературы CR, ссылки UR и т.п.), отдельных записей
+    не дают; блок без DO пропускается. PDF вложения письма достаются только
+    первой записи, чтобы не повторяться в каждой ссылке
+    """
+    references = []
+    seen = set()
+    for block in split_ris_records(pairs):
+        block_text = " ".join(value for _, value in block)
+        seen.update(doi.lower() for doi in find_all_dois(block_text))
+        ris = build_ris(block)
+        doi = find_doi(str(ris.get('DO', '')))
+        if not doi or any(doi.lower() == ref.lower() for ref, _ in references):
+            continue
+        seen.add(doi.lower())
+        references.append((doi, ris))
+
+    for doi in dois:
+        if doi.lower() not in seen:
+            seen.add(doi.lower())
+            references.append((doi, {}))
+
+    records = []
+    for ref, (doi, ris) in enumerate(references):
+        email_data = dict(fields)
+        email_data.update({'doi': doi, 'ref': ref, 'ris': ris})
+        if ref:
+            email_data['pdf_attachments'] = []
+        email_data.update(copy_ris(ris))
+        records.append(email_data)
+    return records
+
+
+def _message_fields(msg: MailMessage, uid: str, folder: str,
+                    email_text: Optional[str], email_html: Optional[str]) -> Dict[str, Any]:
+    """Общие для всех записей письма поля"""
+    fields = {
+        'uid': uid,
+        'folder': folder,
+        'from': msg.from_,
+        # Имя и адрес отправителя: IMAP FROM ищет и по имени
+        'from_full': msg.from_values.full if msg.from_values else msg.from_,
+        'to': msg.to,
+        'subject': msg.subject,
+        'date': msg.date,
+        'pdf_attachments': get_pdf_attachments(msg, folder, uid),  # Добавляем PDF вложения
+    }
+    if email_text is not None:
+        fields['text'] = email_text
+        fields['html'] = email_html
+    return fields
@@ -0,0 +1,130 @@
+"""
+Локальное хранилище публикаций Sci.Net.Node (SQLite)
+Переживает перезапуск Streamlit: записи ключуются по (account, folder, UIDVALIDITY, UID, ref),
+где ref - номер ссылки в письме-дайджесте
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from config import STORE_CONFIG
+
+# Версия схемы; при несовпадении таблицы пересоздаются (данные повторно загрузятся из почты)
+SCHEMA_VERSION = 3
+
+
+class PublicationStore:
+    """Класс для хранения загруженных публикаций и состояния синхронизации"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or STORE_CONFIG["path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _init_schema(self):
+        with closing(self._connect()) as conn, conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS publications")
+                conn.execute("DROP TABLE IF EXISTS sync_state")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS publications (
+                    account TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    uidvalidity INTEGER NOT NULL,
+                    uid INTEGER NOT NULL,
+                    ref INTEGER NOT NULL DEFAULT 0,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (account, folder, uidvalidity, uid, ref)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    account TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    uidvalidity INTEGER NOT NULL,
+                    last_uid INTEGER NOT NULL,
+                    criteria TEXT NOT NULL,
+                    PRIMARY KEY (account, folder)
+                )
+            """)
+
+    def load_publications(self, account: str, folders: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Сохраненные публикации аккаунта (все или только из folders) в порядке загрузки"""
+        sql = "SELECT record FROM publications WHERE account = ?"
+        params = [account]
+        if folders is not None:
+            sql += f" AND folder IN ({', '.join('?' * len(folders))})"
+            params.extend(folders)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql + " ORDER BY rowid", params).fetchall()
+        return [self._decode(record) for (record,) in rows]
+
+    def load_sync_state(self, account: str) -> Dict[str, Dict[str, Any]]:
+        """Состояние синхронизации папок в формате EmailHandler.sync_state"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT folder, uidvalidity, last_uid, criteria FROM sync_state WHERE account = ?",
+                (account,)
+            ).fetchall()
+        return {
+            folder: {'uidvalidity': uidvalidity, 'last_uid': last_uid, 'criteria': criteria}
+            for folder, uidvalidity, last_uid, criteria in rows
+        }
+
+    def save_folder(self, account: str, folder: str, publications: List[Dict[str, Any]],
+                    state: Optional[Dict[str, Any]] = None, replace: bool = False):
+        """
+        Сохранение публикаций папки и ее состояния синхронизации.
+        replace=True удаляет прежние записи папки (полная перезагрузка
+        или смена UIDVALIDITY).
+        """
+        with closing(self._connect()) as conn, conn:
+            if replace:
+                conn.execute("DELETE FROM publications WHERE account = ? AND folder = ?", (account, folder))
+            conn.executemany(
+                "INSERT OR REPLACE INTO publications (account, folder, uidvalidity, uid, ref, record) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (account, folder, int(pub.get('uidvalidity') or 0), int(pub.get('uid') or 0),
+                     int(pub.get('ref') or 0), self._encode(pub))
+                    for pub in publications
+                ]
+            )
+            if state:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (account, folder, uidvalidity, last_uid, criteria) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (account, folder, state['uidvalidity'], state['last_uid'], state['criteria'])
+                )
+
+    def clear(self, account: str):
+        """Удаление всех данных аккаунта"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM publications WHERE account = ?", (account,))
+            conn.execute("DELETE FROM sync_state WHERE account = ?", (account,))
+
+    @staticmethod
+    def _encode(pub: Dict[str, Any]) -> str:
+        return json.dumps(pub, ensure_ascii=False, default=lambda o: o.isoformat() if isinstance(o, datetime) else str(o))
+
+    @staticmethod
+    def _decode(record: str) -> Dict[str, Any]:
+        pub = json.loads(record)
+        # Дата письма хранится в ISO формате
+        if isinstance(pub.get('date'), str):
+            try:
+                pub['date'] = datetime.fromisoformat(pub['date'])
+            except ValueError:
+                pass
+        return pub
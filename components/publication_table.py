@@ -0,0 +1,104 @@
+"""
+Колоночное представление публикаций Sci.Net.Node
+Нормализованная таблица pandas строится один раз после загрузки:
+цепочки pub.get(a) or pub.get(b) разрешаются здесь, а фильтры,
+диаграммы и экспорт работают с готовыми колонками
+"""
+
+from typing import List, Dict, Any, Optional
+
+import pandas as pd
+
+# Колонки таблицы и порядок RIS полей, из которых берется значение
+SCALAR_COLUMNS = {
+    'doi': ('doi', 'DO'),
+    'title': ('title', 'TI', 'subject'),
+    'type': ('type', 'M3', 'TY'),
+    'year': ('year', 'PY'),
+    'journal': ('journal', 'T2'),
+    'abstract': ('abstract', 'AB', 'N2'),
+    'volume': ('VL',),
+    'issue': ('IS',),
+    'pages': ('SP',),
+    'url': ('UR', 'L1', 'L2'),
+    'folder': ('folder',),
+    'from': ('from',),
+    'subject': ('subject',),
+    'uid': ('uid',),
+}
+
+LIST_COLUMNS = {
+    'authors': ('authors', 'AU'),
+    'keywords': ('keywords', 'KW', 'DE'),
+}
+
+CATEGORY_COLUMNS = ('type', 'year', 'folder')
+
+TABLE_COLUMNS = list(SCALAR_COLUMNS) + list(LIST_COLUMNS) + ['date', 'date_ts', 'pdf_count']
+
+
+def _first(pub: Dict[str, Any], keys) -> Any:
+    for key in keys:
+        value = pub.get(key)
+        if value:
+            return value
+    return ''
+
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    return [str(value)]
+
+
+def facet_values(pub: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Значения записи для фасетов: те же цепочки полей, что и в таблице"""
+    values = {name: [str(_first(pub, SCALAR_COLUMNS[name]))] for name in ('type', 'year', 'folder', 'journal')}
+    for name, keys in LIST_COLUMNS.items():
+        values[name] = _as_list(_first(pub, keys))
+    return values
+
+
+def build_publication_table(publications: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Нормализованная таблица публикаций; строка i соответствует publications[i]"""
+    columns: Dict[str, list] = {name: [] for name in TABLE_COLUMNS}
+
+    for pub in publications:
+        for name, keys in SCALAR_COLUMNS.items():
+            columns[name].append(str(_first(pub, keys)))
+        for name, keys in LIST_COLUMNS.items():
+            columns[name].append(_as_list(_first(pub, keys)))
+        columns['date'].append(pub.get('date'))
+        columns['date_ts'].append(pub.get('date_ts'))
+        columns['pdf_count'].append(len(pub.get('pdf_attachments') or []))
+
+    table = pd.DataFrame(columns, columns=TABLE_COLUMNS)
+    for name in CATEGORY_COLUMNS:
+        table[name] = table[name].astype('category')
+    table['date_ts'] = table['date_ts'].astype('Int64')
+    table['pdf_count'] = table['pdf_count'].astype('int32')
+    return table
+
+
+def date_summary(table: pd.DataFrame) -> Dict[str, Optional[int]]:
+    """Границы дат писем по колонке date_ts: {'min_ts', 'max_ts', 'count'}"""
+    stamps = table['date_ts'].dropna()
+    if stamps.empty:
+        return {'min_ts': None, 'max_ts': None, 'count': 0}
+    return {'min_ts': int(stamps.min()), 'max_ts': int(stamps.max()), 'count': int(len(stamps))}
+
+
+def value_counts(table: pd.DataFrame, column: str) -> pd.Series:
+    """Частоты непустых значений колонки (для списков - по отдельным элементам)"""
+    values = table[column]
+    if column in LIST_COLUMNS:
+        values = values.explode()
+    values = values.dropna().astype(str)
+    return values[values != ''].value_counts()
+
+
+def join_list_column(table: pd.DataFrame, column: str, sep: str = ', ') -> pd.Series:
+    """Склейка списковой колонки в строку"""
+    return table[column].str.join(sep)
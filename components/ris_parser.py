@@ -4,9 +4,10 @@ RIS парсер для Sci.Net.Node
 Улучшенная обработка HTML-ссылок
 """
 
-import re
 from typing import Dict, List, Any, Optional
 from config import RIS_TAGS
+from utils.ris_utils import tokenize_ris, build_ris, add_ris_field
+from utils.doi_matcher import is_doi
 import streamlit as st
 
 class RISParser:
@@ -22,57 +23,11 @@ class RISParser:
         if not text:
             return {}
 
-        ris_data = {}
-
-        # Паттерн для RIS полей: TAG - VALUE
-        ris_pattern = r'^([A-Z0-9]{2})\s*-\s*(.+)$'
-
-        lines = text.split('\n')
-        current_tag = None
-        current_value = ""
-
-        for line in lines:
-            line = line.strip()
-
-            # Проверяем начало нового RIS поля
-            match = re.match(ris_pattern, line)
-            if match:
-                # Сохраняем предыдущее поле если есть
-                if current_tag:
-                    self._add_ris_field(ris_data, current_tag, current_value)
-
-                current_tag, current_value = match.groups()
-                current_value = current_value.strip()
-            else:
-                # Продолжение многострочного поля
-                if current_tag and line:
-                    current_value += " " + line
-
-        # Сохраняем последнее поле
-        if current_tag:
-            self._add_ris_field(ris_data, current_tag, current_value)
-
-        return ris_data
+        return build_ris(tokenize_ris(text))
 
     def _add_ris_field(self, ris_data: Dict, tag: str, value: str):
         """Добавление RIS поля в структуру данных с сохранением HTML"""
-        value = value.strip()
-        if not value:
-            return
-
-        # Поля которые могут повторяться
-        multi_fields = ['AU', 'KW', 'DE', 'CR', 'A1', 'A2', 'A3']
-
-        if tag in multi_fields:
-            if tag not in ris_data:
-                ris_data[tag] = []
-            # Не добавляем дубликаты
-            if value not in ris_data[tag]:
-                ris_data[tag].append(value)
-        else:
-            # Для одиночных полей - выбираем наиболее подробное значение
-            if tag not in ris_data or len(value) > len(str(ris_data.get(tag, ''))):
-                ris_data[tag] = value
+        add_ris_field(ris_data, tag, value)
 
     def extract_publication_info(self, ris_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -187,9 +142,7 @@ class RISParser:
         if not doi:
             return False
 
-        # Базовый паттерн DOI
-        doi_pattern = r'^10\.\d{4,9}/[-._;()/:A-Z0-9]+$'
-        return bool(re.match(doi_pattern, doi, re.IGNORECASE))
+        return is_doi(doi)
 
     def clean_doi(self, doi: str) -> str:
         """Очистка DOI от лишних символов"""
@@ -2,16 +2,37 @@
 Move 'Load emails' button below 'Mailbox folders' selection and set default folders to only INBOX and Sent.
 """
 import streamlit as st
-from datetime import datetime, date
-from typing import List, Dict, Any
+from datetime import datetime, date, timezone
+from typing import List, Dict, Any, Optional
 import plotly.express as px
 import plotly.graph_objects as go
 from collections import Counter
 import pandas as pd
+from components.publication_table import build_publication_table, value_counts, date_summary
+from components.facet_index import FacetIndex, FACETS
+from components.filter_index import FilterIndex
+from utils.export_utils import export_ris, as_download, available_table_formats, TABLE_FORMATS, RIS_MIME, GZIP_MIME
+
+TABLE_FORMAT_LABELS = {'csv': 'CSV', 'parquet': 'Parquet', 'xlsx': 'Excel (XLSX)'}
+
+# Ключи виджетов локальных фильтров в st.session_state
+FILTER_KEYS = {
+    'types': 'filter_types',
+    'years': 'filter_years',
+    'author_search': 'filter_author',
+    'title_search': 'filter_title',
+    'keywords_search': 'filter_keywords',
+}
 
 class SidebarPanel:
-    def __init__(self, publications: List[Dict[str, Any]]):
+    def __init__(self, publications: List[Dict[str, Any]], table: Optional[pd.DataFrame] = None,
+                 dates: Optional[Dict[str, Optional[int]]] = None,
+                 facets: Optional[FacetIndex] = None, filter_index: Optional[FilterIndex] = None):
         self.publications = publications
+        self.table = table if table is not None else build_publication_table(publications)
+        self.dates = dates if dates is not None else date_summary(self.table)
+        self.facets = facets if facets is not None else FacetIndex.from_table(self.table)
+        self.filter_index = filter_index if filter_index is not None else FilterIndex(self.table)
         st.markdown("""
         <style>
         .css-1d391kg { background-color: #f8f9fa !important; }
@@ -36,24 +57,9 @@ class SidebarPanel:
         Если данных нет — ставим год назад до сегодня.
         """
         today = date.today()
-        if not self.publications:
-            return today.replace(year=today.year-1), today
-        dates = []
-        for p in self.publications:
-            d = p.get('date')
-            if isinstance(d, str):
-                try:
-                    from dateutil import parser
-                    d = parser.parse(d).date()
-                except Exception:
-                    d = None
-            elif isinstance(d, datetime):
-                d = d.date()
-            if isinstance(d, date):
-                dates.append(d)
-        if not dates:
+        if self.dates['min_ts'] is None:
             return today.replace(year=today.year-1), today
-        return min(dates), today
+        return datetime.fromtimestamp(self.dates['min_ts'], timezone.utc).date(), today
 
     def render_filters_section(self, folders: List[str]) -> Dict[str, Any]:
         st.sidebar.header("🔍 Фильтры")
@@ -68,14 +74,44 @@ class SidebarPanel:
         if not default_folders and folders:
             default_folders = folders[:2] if len(folders) >= 2 else folders
         
+        folder_counts = self.facets.counts('folder')
         selected_folders = st.sidebar.multiselect(
             "Папки почтового ящика", 
             options=folders, 
             default=default_folders, 
+            format_func=lambda f: f"{f} ({folder_counts[f]})" if f in folder_counts else f,
             help="Выберите папки для отображения писем"
         )
 
         # Кнопка загрузки писем — ПОСЛЕ выбора папок
+        incremental = st.sidebar.checkbox(
+            "Загружать только новые письма",
+            value=True,
+            help="Повторная загрузка забирает из папок только письма, пришедшие после предыдущей"
+        )
+        multi_doi = st.sidebar.checkbox(
+            "Все DOI из письма",
+            value=False,
+            help="Для писем-дайджестов: отдельная публикация на каждый DOI и блок RIS (TY ... ER)"
+        )
+        prefilter = st.sidebar.checkbox(
+            "Отбирать письма с DOI на сервере",
+            value=True,
+            help="Скачиваются только письма, в тексте которых сервер нашел \"10.\". "
+                 "Отключите, если сервер ищет по тексту писем ненадежно и письма с DOI пропадают"
+        )
+        with st.sidebar.expander("🔎 Поиск на сервере"):
+            from_search = st.text_input("Отправитель (From)", placeholder="Адрес или имя...",
+                                        help="Загружать только письма этого отправителя")
+            subject_search = st.text_input("Тема письма", placeholder="Слова из темы...",
+                                           help="Загружать только письма с этой темой")
+            server_search = st.checkbox(
+                "Учитывать поиск по RIS полям",
+                value=False,
+                help="Поиск по автору, заголовку и ключевым словам выполняется сервером "
+                     "по тексту писем: загружаются только подходящие письма. "
+                     "Некоторые серверы ищут по целым словам, а не по подстроке"
+            )
         load_click = st.sidebar.button("📥 Загрузить письма", type="primary")
 
         # Период
@@ -89,13 +125,19 @@ class SidebarPanel:
 
         # RIS фильтры
         st.sidebar.subheader("📋 RIS поля")
+        # Счетчики под остальными активными фильтрами (значения виджетов прошлого rerun)
+        active = self._active_filters()
+        type_counts = self._facet_counts('type', active)
+        year_counts = self._facet_counts('year', active)
         unique_types = self._get_unique_field_values('type')
         unique_years = self._get_unique_field_values('year')
-        selected_types = st.sidebar.multiselect("Тип публикации (M3/TY)", options=unique_types, help="Фильтр по типу работы")
-        selected_years = st.sidebar.multiselect("Год публикации (PY)", options=sorted(unique_years, reverse=True), help="Фильтр по году публикации")
-        author_search = st.sidebar.text_input("Поиск по автору (AU)", placeholder="Введите имя автора...", help="Поиск по авторам публикации")
-        title_search = st.sidebar.text_input("Поиск по заголовку (TI)", placeholder="Введите ключевые слова...", help="Поиск по заголовку публикации")
-        keywords_search = st.sidebar.text_input("Поиск по ключевым словам (KW/DE)", placeholder="Введите ключевые слова...", help="Поиск по ключевым словам")
+        selected_types = st.sidebar.multiselect("Тип публикации (M3/TY)", options=unique_types, key=FILTER_KEYS['types'],
+                                                format_func=lambda v: f"{v} ({type_counts.get(v, 0)})", help="Фильтр по типу работы")
+        selected_years = st.sidebar.multiselect("Год публикации (PY)", options=sorted(unique_years, reverse=True), key=FILTER_KEYS['years'],
+                                                format_func=lambda v: f"{v} ({year_counts.get(v, 0)})", help="Фильтр по году публикации")
+        author_search = st.sidebar.text_input("Поиск по автору (AU)", placeholder="Введите имя автора...", key=FILTER_KEYS['author_search'], help="Поиск по авторам публикации")
+        title_search = st.sidebar.text_input("Поиск по заголовку (TI)", placeholder="Введите ключевые слова...", key=FILTER_KEYS['title_search'], help="Поиск по заголовку публикации")
+        keywords_search = st.sidebar.text_input("Поиск по ключевым словам (KW/DE)", placeholder="Введите ключевые слова...", key=FILTER_KEYS['keywords_search'], help="Поиск по ключевым словам")
 
         # Возвращаем сигнал о клике на загрузку вместе с фильтрами
         return {
@@ -107,17 +149,32 @@ class SidebarPanel:
             'author_search': author_search,
             'title_search': title_search,
             'keywords_search': keywords_search,
+            'incremental': incremental,
+            'multi_doi': multi_doi,
+            'prefilter': prefilter,
+            'from_search': from_search,
+            'subject_search': subject_search,
+            'server_search': server_search,
             'load_click': load_click
         }
 
-    def render_analytics_section(self, filtered_publications: List[Dict[str, Any]]):
+    def render_enrichment_section(self) -> bool:
+        """Кнопка обогащения загруженных публикаций метаданными Crossref и OpenAlex"""
+        st.sidebar.header("🧬 Метаданные")
+        return st.sidebar.button(
+            "🔄 Дополнить из Crossref и OpenAlex",
+            disabled=not self.publications,
+            help="Заполнить пустые RIS поля публикаций по их DOI"
+        )
+
+    def render_analytics_section(self, filtered_table: pd.DataFrame):
         st.sidebar.header("📊 Аналитика")
-        if not filtered_publications:
+        if filtered_table.empty:
             st.sidebar.info("Нет данных для анализа")
             return
             
-        total_pubs = len(filtered_publications)
-        unique_dois = len(set(pub.get('doi', '') for pub in filtered_publications if pub.get('doi')))
+        total_pubs = len(filtered_table)
+        unique_dois = filtered_table['doi'][filtered_table['doi'] != ''].nunique()
         st.sidebar.metric("Всего публикаций", total_pubs)
         st.sidebar.metric("Уникальных DOI", unique_dois)
         
@@ -133,51 +190,51 @@ class SidebarPanel:
         )
         
         if st.sidebar.button("📊 Показать частоты", key="frequency_chart"):
-            self._show_frequency_chart(filtered_publications, analysis_field)
+            self._show_frequency_chart(filtered_table, analysis_field)
         
         if st.sidebar.button("🌟 Отобразить концепции", key="concepts_chart"):
-            self._show_concepts_sankey(filtered_publications)
+            self._show_concepts_sankey(filtered_table)
         
         st.sidebar.subheader("💾 Экспорт")
+        st.sidebar.checkbox("Сжимать выгрузку RIS (gzip)", key="export_gzip",
+                            help="Файл .ris.gz для больших выборок")
         if st.sidebar.button("📄 Скачать RIS"):
-            self._export_to_ris(filtered_publications)
-        if st.sidebar.button("📊 Скачать CSV"):
-            self._export_to_csv(filtered_publications)
+            self._export_to_ris(filtered_table)
+        formats = available_table_formats()
+        table_format = st.sidebar.selectbox("Формат таблицы", options=formats,
+                                            format_func=TABLE_FORMAT_LABELS.get)
+        if 'parquet' not in formats:
+            st.sidebar.caption("Выгрузка Parquet недоступна: установите pyarrow (pip install pyarrow)")
+        if st.sidebar.button("📊 Скачать таблицу"):
+            self._export_table(filtered_table, table_format)
 
     def _get_unique_field_values(self, field: str) -> List[str]:
-        values = set()
-        for pub in self.publications:
-            value = pub.get(field)
-            if isinstance(value, list):
-                values.update(str(v) for v in value if v)
-            elif value:
-                values.add(str(value))
-        return sorted(list(values))
+        return sorted(self.facets.counts(field))
+
+    def _active_filters(self) -> Dict[str, Any]:
+        """Непустые значения локальных фильтров из st.session_state"""
+        return {name: st.session_state[key] for name, key in FILTER_KEYS.items() if st.session_state.get(key)}
+
+    def _facet_counts(self, facet: str, filters: Dict[str, Any]) -> Dict[str, int]:
+        """Счетчики фасета под фильтрами, кроме выбора в самом фасете"""
+        scoped = {name: value for name, value in filters.items() if name != FACETS[facet]}
+        if not scoped:
+            return self.facets.counts(facet)
+        return self.facets.counts(facet, self.filter_index.filter(scoped))
 
-    def _show_frequency_chart(self, publications: List[Dict[str, Any]], field: str):
+    def _show_frequency_chart(self, table: pd.DataFrame, field: str):
         """Отображение диаграммы частот для выбранного поля"""
-        values = []
-        for pub in publications:
-            value = pub.get(field)
-            if isinstance(value, list):
-                values.extend([str(v) for v in value if v])
-            elif value:
-                values.append(str(value))
+        values = value_counts(table, field)
         
-        if not values:
+        if values.empty:
             st.warning(f"Нет данных для поля {field}")
             return
         
-        # Подсчет частот
-        freq_counter = Counter(values)
-        top_values = freq_counter.most_common(10)  # Топ-10
-        
-        if not top_values:
-            st.warning(f"Нет данных для отображения")
-            return
+        # Топ-10 значений
+        top_values = values.head(10)
         
         # Создание диаграммы
-        labels, counts = zip(*top_values)
+        labels, counts = top_values.index, top_values.to_numpy()
         
         fig = px.bar(
             x=list(counts),
@@ -190,26 +247,14 @@ class SidebarPanel:
         
         st.plotly_chart(fig, use_container_width=True)
 
-    def _show_concepts_sankey(self, publications: List[Dict[str, Any]]):
+    def _show_concepts_sankey(self, table: pd.DataFrame):
         """Отображение Sankey диаграммы связей между концепциями"""
-        # Собираем связи между авторами и ключевыми словами
-        author_keyword_pairs = []
-        
-        for pub in publications:
-            authors = pub.get('authors', []) or pub.get('AU', [])
-            keywords = pub.get('keywords', []) or pub.get('KW', []) or pub.get('DE', [])
-            
-            if not isinstance(authors, list):
-                authors = [authors] if authors else []
-            if not isinstance(keywords, list):
-                keywords = [keywords] if keywords else []
-            
-            # Берем первого автора и первые 3 ключевых слова
-            first_author = authors[0] if authors else "Неизвестный автор"
-            top_keywords = keywords[:3] if keywords else ["Без ключевых слов"]
-            
-            for keyword in top_keywords:
-                author_keyword_pairs.append((str(first_author), str(keyword)))
+        # Собираем связи между первым автором и первыми 3 ключевыми словами
+        pairs = pd.DataFrame({
+            'author': table['authors'].str[0].fillna("Неизвестный автор"),
+            'keyword': table['keywords'].map(lambda kws: kws[:3] or ["Без ключевых слов"]),
+        }).explode('keyword')
+        author_keyword_pairs = list(zip(pairs['author'].astype(str), pairs['keyword'].astype(str)))
         
         if not author_keyword_pairs:
             st.warning("Нет данных для создания диаграммы связей")
@@ -264,112 +309,61 @@ class SidebarPanel:
         
         st.plotly_chart(fig, use_container_width=True)
 
-    def _export_to_ris(self, publications: List[Dict[str, Any]]):
+    def _export_to_ris(self, table: pd.DataFrame):
         """Экспорт публикаций в формат RIS"""
-        if not publications:
+        if table.empty:
             st.warning("Нет данных для экспорта")
             return
-        
-        ris_content = []
-        
-        for pub in publications:
-            ris_content.append("TY  - JOUR")
-            
-            # Заголовок
-            title = pub.get('title') or pub.get('TI') or pub.get('subject', '')
-            if title:
-                ris_content.append(f"TI  - {title}")
-            
-            # Авторы
-            authors = pub.get('authors', []) or pub.get('AU', [])
-            if isinstance(authors, list):
-                for author in authors:
-                    if author:
-                        ris_content.append(f"AU  - {author}")
-            elif authors:
-                ris_content.append(f"AU  - {authors}")
-            
-            # Год
-            year = pub.get('year') or pub.get('PY')
-            if year:
-                ris_content.append(f"PY  - {year}")
-            
-            # Журнал
-            journal = pub.get('journal') or pub.get('T2')
-            if journal:
-                ris_content.append(f"T2  - {journal}")
-            
-            # DOI
-            doi = pub.get('doi') or pub.get('DO')
-            if doi:
-                ris_content.append(f"DO  - {doi}")
-            
-            # Ключевые слова
-            keywords = pub.get('keywords', []) or pub.get('KW', []) or pub.get('DE', [])
-            if isinstance(keywords, list):
-                for keyword in keywords:
-                    if keyword:
-                        ris_content.append(f"KW  - {keyword}")
-            elif keywords:
-                ris_content.append(f"KW  - {keywords}")
-            
-            # Аннотация
-            abstract = pub.get('abstract') or pub.get('AB') or pub.get('N2')
-            if abstract:
-                ris_content.append(f"AB  - {abstract}")
-            
-            ris_content.append("ER  - ")
-            ris_content.append("")
-        
-        # Создаем файл для скачивания
-        ris_text = "\n".join(ris_content)
-        
+
+        # Записи пишутся во временный файл по мере обхода таблицы
+        compress = st.session_state.get("export_gzip", False)
+        with st.spinner("📄 Подготовка RIS файла..."):
+            ris_file, _ = export_ris(self._ris_records(table), compress)
+
+        file_name = f"sci_net_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ris"
         st.download_button(
             label="📄 Скачать RIS файл",
-            data=ris_text,
-            file_name=f"sci_net_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ris",
-            mime="application/x-research-info-systems"
+            data=as_download(ris_file),
+            file_name=file_name + ".gz" if compress else file_name,
+            mime=GZIP_MIME if compress else RIS_MIME
         )
 
-    def _export_to_csv(self, publications: List[Dict[str, Any]]):
-        """Экспорт публикаций в формат CSV"""
-        if not publications:
+    def _ris_records(self, table: pd.DataFrame):
+        """Пары (тег, значение) RIS по строкам таблицы"""
+        for pub in table.itertuples(index=False):
+            pairs = [("TY", "JOUR")]
+            if pub.title:
+                pairs.append(("TI", pub.title))
+            pairs.extend(("AU", author) for author in pub.authors)
+            if pub.year:
+                pairs.append(("PY", pub.year))
+            if pub.journal:
+                pairs.append(("T2", pub.journal))
+            if pub.doi:
+                pairs.append(("DO", pub.doi))
+            pairs.extend(("KW", keyword) for keyword in pub.keywords)
+            if pub.abstract:
+                pairs.append(("AB", pub.abstract))
+            yield pairs
+
+    def _export_table(self, table: pd.DataFrame, fmt: str):
+        """Экспорт публикаций таблицей: CSV, Parquet или Excel"""
+        if table.empty:
             st.warning("Нет данных для экспорта")
             return
-        
-        # Подготавливаем данные для CSV
-        csv_data = []
-        
-        for pub in publications:
-            row = {
-                'Title': pub.get('title') or pub.get('TI') or pub.get('subject', ''),
-                'Authors': ', '.join(pub.get('authors', []) or pub.get('AU', []) if isinstance(pub.get('authors') or pub.get('AU', []), list) else [pub.get('authors') or pub.get('AU', '')]),
-                'Year': pub.get('year') or pub.get('PY', ''),
-                'Journal': pub.get('journal') or pub.get('T2', ''),
-                'DOI': pub.get('doi') or pub.get('DO', ''),
-                'Type': pub.get('type') or pub.get('M3') or pub.get('TY', ''),
-                'Keywords': ', '.join(pub.get('keywords', []) or pub.get('KW', []) or pub.get('DE', []) if isinstance(pub.get('keywords') or pub.get('KW', []) or pub.get('DE', []), list) else [pub.get('keywords') or pub.get('KW') or pub.get('DE', '')]),
-                'Abstract': pub.get('abstract') or pub.get('AB') or pub.get('N2', ''),
-                'Volume': pub.get('VL', ''),
-                'Issue': pub.get('IS', ''),
-                'Pages': pub.get('SP', ''),
-                'URL': pub.get('UR') or pub.get('L1') or pub.get('L2', ''),
-                'Folder': pub.get('folder', ''),
-                'Email_From': pub.get('from', ''),
-                'Email_Date': pub.get('date', ''),
-                'PDF_Count': len(pub.get('pdf_attachments', []))
-            }
-            csv_data.append(row)
-        
-        # Создаем DataFrame
-        df = pd.DataFrame(csv_data)
-        
-        # Конвертируем в CSV
-        csv_buffer = df.to_csv(index=False, encoding='utf-8-sig')
-        
+
+        # Колонки собираются из таблицы векторно, файл пишется порциями
+        extension, mime, export = TABLE_FORMATS[fmt]
+        try:
+            with st.spinner("📊 Подготовка файла..."):
+                table_file = export(table)
+        except Exception as e:
+            st.error(f"Ошибка экспорта: {e}")
+            return
+
         st.download_button(
-            label="📊 Скачать CSV файл",
-            data=csv_buffer,
-            file_name=f"sci_net_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
+            label=f"📊 Скачать {TABLE_FORMAT_LABELS[fmt]} файл",
+            data=as_download(table_file),
+            file_name=f"sci_net_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+            mime=mime
         )
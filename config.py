@@ -9,7 +9,19 @@ EMAIL_CONFIG = {
     "imap_server": "imap.mail.ru",
     "smtp_server": "smtp.mail.ru", 
     "smtp_port": 465,
-    "use_ssl": True
+    "use_ssl": True,
+    # Сколько писем забирать одной командой FETCH
+    "fetch_bulk_size": 50,
+    # Сколько IMAP-соединений держать для параллельной загрузки папок
+    "imap_pool_size": 4,
+    # Сколько разобранных записей папки держать в очереди при параллельной загрузке
+    "folder_queue_size": 100,
+    # Предельный объем кэша открытых PDF вложений, байт
+    "pdf_cache_bytes": 50 * 1024 * 1024,
+    # Сколько процессов разбирают письма при загрузке (0 - разбор в потоке загрузки)
+    "parse_workers": int(os.getenv("SCINET_PARSE_WORKERS", "0")),
+    # Сколько писем передавать процессу разбора за раз
+    "parse_batch_size": 10
 }
 
 # Настройки приложения
@@ -19,11 +31,65 @@ APP_CONFIG = {
     "version": "1.0.0"
 }
 
+# Локальное хранилище загруженных публикаций
+STORE_CONFIG = {
+    "path": os.getenv("SCINET_STORE_PATH", os.path.join("data", "publications.db"))
+}
+
 # API настройки
 API_CONFIG = {
     "openalex_base_url": "https://api.openalex.org",
     "crossref_base_url": "https://api.crossref.org",
-    "user_agent": "SciNetNode/1.0 (https://github.com/user/sci-net-node)"
+    "user_agent": "SciNetNode/1.0 (https://github.com/user/sci-net-node)",
+    # Контактный адрес для вежливого пула OpenAlex и этикета Crossref
+    # (пустой - используется адрес подключенной почты)
+    "mailto": os.getenv("SCINET_CONTACT_EMAIL", "")
+}
+
+# Настройки HTTP клиента для Crossref и OpenAlex
+HTTP_CONFIG = {
+    "pool_connections": 4,
+    "pool_maxsize": 16,
+    "max_retries": 4,
+    "backoff_factor": 0.5
+}
+
+# Дисковый кэш ответов Crossref и OpenAlex (TTL в секундах)
+CACHE_CONFIG = {
+    "path": os.getenv("SCINET_CACHE_PATH", os.path.join("data", "api_cache.db")),
+    "ttl": {
+        "crossref": 30 * 24 * 3600,
+        "openalex": 7 * 24 * 3600
+    },
+    "default_ttl": 7 * 24 * 3600,
+    "negative_ttl": 24 * 3600,
+    "max_bytes": 200 * 1024 * 1024,
+    # Вытеснение идет до этой доли max_bytes, по evict_batch записей за запрос
+    "low_water": 0.8,
+    "evict_batch": 500,
+    # Сколько обращений копить перед записью времени последнего обращения
+    "touch_batch": 100
+}
+
+# Массовое обогащение DOI метаданными (лимиты запросов в секунду по хостам)
+ENRICHMENT_CONFIG = {
+    "concurrency": 8,
+    "openalex_batch_size": 50,
+    # Период опроса фонового обогащения (rerun скрипта Streamlit), с
+    "poll_seconds": 1.0,
+    "rate_limits": {
+        "crossref": 10,
+        "openalex": 5
+    }
+}
+
+# Выгрузка публикаций: файлы больше spool_bytes пишутся на диск
+EXPORT_CONFIG = {
+    "spool_bytes": 16 * 1024 * 1024,
+    # Сколько записей RIS копить перед записью в файл
+    "ris_chunk_records": 500,
+    # Строк таблицы в одной порции CSV/XLSX и в одной группе строк Parquet
+    "chunk_rows": 10000
 }
 
 # RIS теги и их описания
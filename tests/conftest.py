@@ -0,0 +1,28 @@
+"""
+Общие данные тестов Sci.Net.Node
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+
+@pytest.fixture
+def publications():
+    """Небольшой набор публикаций в том виде, в каком их собирает app.py"""
+    def pub(i, ty, year, authors, keywords, title, folder='INBOX', date=None):
+        return {
+            'DO': f'10.1000/{i}', 'TY': ty, 'PY': year, 'AU': authors, 'KW': keywords,
+            'TI': title, 'T2': 'Journal A', 'folder': folder, 'uid': str(i),
+            'date': date, 'date_ts': int(date.timestamp()) if date else None,
+            'pdf_attachments': [{'filename': 'a.pdf'}] if i == 0 else [],
+        }
+
+    return [
+        pub(0, 'JOUR', '2021', ['Smith, J', 'Doe, A'], ['graphs'], 'Graph neural networks',
+            date=datetime(2024, 1, 5, 23, 30, tzinfo=timezone.utc)),
+        pub(1, 'JOUR', '2022', ['Ivanov, I'], ['graphs', 'sparse'], 'Sparse solvers'),
+        pub(2, 'BOOK', '2022', ['Smith, J'], [], 'Handbook of graphs', folder='Sent',
+            date=datetime(2024, 2, 1, tzinfo=timezone.utc)),
+        pub(3, 'CONF', '2020', [], ['Ранжирование'], 'Поиск по тексту'),
+    ]
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+from utils.enrichment import AsyncRateLimiter, EnrichmentEngine, EnrichmentJob
+
+
+def test_rate_limiter_spaces_requests():
+    async def run():
+        limiter = AsyncRateLimiter(50)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stamps = []
+
+        async def request():
+            await limiter.wait()
+            stamps.append(loop.time() - start)
+
+        await asyncio.gather(*(request() for _ in range(5)))
+        return stamps
+
+    stamps = sorted(asyncio.run(run()))
+    assert stamps[0] < 0.02
+    # Пять запросов при 50 в секунду занимают не меньше четырех интервалов
+    assert stamps[-1] >= 4 * 0.02 * 0.9
+
+
+def test_zero_rate_does_not_wait():
+    async def run():
+        limiter = AsyncRateLimiter(0)
+        for _ in range(100):
+            await limiter.wait()
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - started < 0.5
+
+
+class SlowEngine(EnrichmentEngine):
+    """Движок без сети: по одному DOI в 10 мс, с проверкой отмены"""
+
+    def run(self, dois, on_result=None, on_progress=None, cancel_event=None):
+        for i, doi in enumerate(dois):
+            if cancel_event.is_set():
+                break
+            time.sleep(0.01)
+            on_result(doi, {'TI': doi})
+            on_progress(i + 1, len(dois))
+        return {}
+
+
+def test_job_collects_results_in_background():
+    job = EnrichmentJob(['10.1/a', '10.1/b'], engine=SlowEngine()).start()
+    job._thread.join(5)
+    assert not job.is_alive()
+    assert job.take_results() == [('10.1/a', {'TI': '10.1/a'}), ('10.1/b', {'TI': '10.1/b'})]
+    assert job.take_results() == []
+    assert (job.done, job.total, job.received) == (2, 2, 2)
+
+
+def test_job_cancel_stops_engine():
+    job = EnrichmentJob([f'10.1/{i}' for i in range(500)], engine=SlowEngine()).start()
+    time.sleep(0.05)
+    job.cancel()
+    job._thread.join(5)
+    assert job.cancelled and not job.is_alive()
+    assert job.received < 500
+
+
+def test_engine_errors_do_not_raise(monkeypatch):
+    def failing(*args):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr('utils.enrichment.DOIUtils.fetch_crossref_data', failing)
+    monkeypatch.setattr('utils.enrichment.OpenAlexUtils.fetch_works_by_dois', failing)
+    monkeypatch.setattr('utils.enrichment.get_response_cache', lambda: _EmptyCache())
+
+    engine = EnrichmentEngine(rate_limits={'crossref': 0, 'openalex': 0})
+    results = engine.run(['10.1000/a'], cancel_event=threading.Event())
+    assert results == {'10.1000/a': {}}
+    assert len(engine.errors) == 2
+
+
+class _EmptyCache:
+    def get(self, source, key):
+        return False, None
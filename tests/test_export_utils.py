@@ -0,0 +1,79 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+from components.publication_table import build_publication_table
+from utils import export_utils
+from utils.export_utils import EXPORT_COLUMNS, as_download, export_csv, export_ris, export_xlsx
+
+
+@pytest.fixture
+def table(publications):
+    return build_publication_table(publications)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Порции по две строки: проверяется склейка нескольких порций"""
+    monkeypatch.setitem(export_utils.EXPORT_CONFIG, "chunk_rows", 2)
+    monkeypatch.setitem(export_utils.EXPORT_CONFIG, "ris_chunk_records", 2)
+
+
+def test_ris_export():
+    records = [[('TY', 'JOUR'), ('DO', f'10.1000/{i}')] for i in range(3)]
+    ris_file, count = export_ris(iter(records))
+    text = as_download(ris_file).decode('utf-8')
+    assert count == 3
+    assert text.count("ER  - \n\n") == 3
+    assert text.startswith("TY  - JOUR\nDO  - 10.1000/0\nER  - \n\n")
+    assert ris_file.closed
+
+
+def test_ris_export_gzip():
+    ris_file, count = export_ris([[('TI', 'Заголовок')]], compress=True)
+    assert gzip.decompress(as_download(ris_file)).decode('utf-8') == "TI  - Заголовок\nER  - \n\n"
+
+
+def test_csv_export(table):
+    data = as_download(export_csv(table))
+    assert data.startswith('\ufeff'.encode('utf-8'))
+    frame = pd.read_csv(io.BytesIO(data), encoding='utf-8-sig', keep_default_na=False)
+    assert list(frame.columns) == list(EXPORT_COLUMNS)
+    assert len(frame) == len(table)
+    assert frame['Authors'][0] == 'Smith, J, Doe, A'
+    assert frame['Email_Date'][0] == '2024-01-05 23:30:00+00:00'
+    assert frame['Email_Date'][1] == ''
+    assert frame['PDF_Count'].tolist() == [1, 0, 0, 0]
+
+
+def test_xlsx_export(table):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.load_workbook(io.BytesIO(as_download(export_xlsx(table))))
+    rows = list(workbook.active.values)
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    assert len(rows) == len(table) + 1
+    header = rows[0]
+    assert rows[4][header.index('Keywords')] == 'Ранжирование'
+    assert rows[1][header.index('Email_Date')].isoformat() == '2024-01-05T23:30:00'
+    assert rows[2][header.index('Email_Date')] is None
+
+
+def test_parquet_export(table):
+    pq = pytest.importorskip('pyarrow.parquet')
+    parquet_file = pq.ParquetFile(io.BytesIO(as_download(export_utils.export_parquet(table))))
+    # Каждая порция - отдельная группа строк
+    assert parquet_file.num_row_groups == 2
+    frame = parquet_file.read().to_pandas()
+    assert list(frame.columns) == list(EXPORT_COLUMNS)
+    assert frame['Title'].tolist() == table['title'].tolist()
+    assert frame['Email_Date'].isna().tolist() == [False, True, False, True]
+
+
+def test_table_formats_depend_on_pyarrow(monkeypatch):
+    assert 'csv' in export_utils.available_table_formats()
+    monkeypatch.setattr(export_utils, 'pq', None)
+    assert export_utils.available_table_formats() == ['csv', 'xlsx']
+    with pytest.raises(RuntimeError):
+        export_utils.export_parquet(pd.DataFrame())
@@ -0,0 +1,32 @@
+from components.facet_index import FacetIndex
+from components.publication_table import build_publication_table
+
+
+def test_facet_totals(publications):
+    index = FacetIndex.from_table(build_publication_table(publications))
+    assert index.counts('type') == {'JOUR': 2, 'BOOK': 1, 'CONF': 1}
+    assert index.counts('authors') == {'Smith, J': 2, 'Doe, A': 1, 'Ivanov, I': 1}
+    assert index.counts('keywords') == {'graphs': 2, 'sparse': 1, 'Ранжирование': 1}
+    assert index.counts('folder') == {'INBOX': 3, 'Sent': 1}
+
+
+def test_facet_counts_for_positions(publications):
+    index = FacetIndex.from_table(build_publication_table(publications))
+    # Разреженная выборка и выборка через маску дают одинаковые счетчики
+    assert index.counts('year', [2]) == {'2022': 1}
+    assert index.counts('year', [0, 1, 2]) == {'2021': 1, '2022': 2}
+    assert index.counts('authors', []) == {}
+
+
+def test_incremental_index_matches_table_build(publications):
+    built = FacetIndex.from_table(build_publication_table(publications))
+    added = FacetIndex.from_publications(publications[:2])
+    added.merge(FacetIndex.from_publications(publications[2:]))
+    for facet in ('type', 'year', 'authors', 'keywords'):
+        assert added.counts(facet) == built.counts(facet)
+        assert added.counts(facet, [1, 3]) == built.counts(facet, [1, 3])
+
+
+def test_duplicate_values_are_counted_once_per_record():
+    index = FacetIndex.from_publications([{'KW': ['a', 'a', 'b']}])
+    assert index.counts('keywords') == {'a': 1, 'b': 1}
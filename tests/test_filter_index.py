@@ -0,0 +1,27 @@
+from components.filter_index import FilterIndex, filter_signature
+from components.publication_table import build_publication_table
+
+
+def test_filter_by_type_and_year(publications):
+    index = FilterIndex(build_publication_table(publications))
+    assert index.filter({}) == [0, 1, 2, 3]
+    assert index.filter({'types': ['JOUR']}) == [0, 1]
+    assert index.filter({'types': ['JOUR', 'BOOK'], 'years': ['2022']}) == [1, 2]
+    assert index.filter({'years': [2020]}) == [3]
+
+
+def test_filter_by_substrings(publications):
+    index = FilterIndex(build_publication_table(publications))
+    assert index.filter({'author_search': 'SMITH'}) == [0, 2]
+    assert index.filter({'title_search': 'graph'}) == [0, 2]
+    assert index.filter({'title_search': 'graph', 'types': ['BOOK']}) == [2]
+    assert index.filter({'keywords_search': 'ранж'}) == [3]
+    # Короче n-граммы: проверка перебором
+    assert index.filter({'author_search': 'iv'}) == [1]
+    # Поиск не склеивает соседних авторов
+    assert index.filter({'author_search': 'j doe'}) == []
+
+
+def test_filter_signature_ignores_empty_filters():
+    assert filter_signature({'types': [], 'author_search': '', 'folders': ['INBOX']}) == '[]'
+    assert filter_signature({'years': ['2022'], 'title_search': 'x'}) != filter_signature({'years': ['2022']})
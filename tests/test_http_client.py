@@ -0,0 +1,26 @@
+from utils import http_client
+
+
+class _Session:
+    headers = {}
+
+    def get(self, url, params=None, timeout=None):
+        return url, params
+
+
+def test_contact_email_goes_to_user_agent_and_params(monkeypatch):
+    monkeypatch.setitem(http_client.API_CONFIG, "mailto", "")
+    monkeypatch.setattr(http_client, "_contact_email", "")
+    monkeypatch.setattr(http_client, "_session", _Session())
+    assert http_client.http_get("https://api.openalex.org/works", {'filter': 'x'})[1] == {'filter': 'x'}
+
+    http_client.set_contact_email("me@example.org")
+    assert http_client._user_agent().endswith("; mailto:me@example.org)")
+    assert http_client.http_get("https://api.crossref.org/works/10.1000/a")[1] == {'mailto': 'me@example.org'}
+
+
+def test_configured_contact_email_is_kept(monkeypatch):
+    monkeypatch.setitem(http_client.API_CONFIG, "mailto", "team@example.org")
+    monkeypatch.setattr(http_client, "_contact_email", "team@example.org")
+    http_client.set_contact_email("me@example.org")
+    assert http_client._contact_email == "team@example.org"
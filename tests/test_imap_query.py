@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+from imap_tools import MailMessage
+
+from components.imap_query import IMAPQuery, plan_imap_query
+from components.message_parser import _message_fields
+
+
+def test_end_date_is_inclusive():
+    query = IMAPQuery(date(2024, 9, 1), date(2024, 9, 2))
+    assert query.criteria == ['(SINCE 1-Sep-2024 BEFORE 3-Sep-2024)']
+
+
+def test_datetimes_are_reduced_to_dates():
+    query = IMAPQuery(datetime(2024, 12, 31, 23, 59), datetime(2024, 12, 31, 23, 59))
+    assert query.criteria == ['(SINCE 31-Dec-2024 BEFORE 1-Jan-2025)']
+
+
+def test_empty_query_has_no_criteria():
+    query = plan_imap_query({'date_from': None, 'date_to': None})
+    assert query.criteria == []
+    assert query.signature() == ''
+    assert not query.has_text
+
+
+def test_from_and_subject_are_pushed_down_and_trimmed():
+    query = plan_imap_query({'from_search': ' alerts@journal.org ', 'subject_search': 'New issue'})
+    assert query.criteria == ['(FROM "alerts@journal.org")', '(SUBJECT "New issue")']
+    assert query.charset == 'US-ASCII'
+
+
+def test_non_ascii_terms_need_utf8():
+    query = plan_imap_query({'subject_search': 'Новый выпуск'})
+    assert query.charset == 'UTF-8'
+    assert query.date_criteria == []
+
+
+def test_publication_searches_only_with_server_search():
+    filters = {'author_search': 'smith', 'title_search': 'graph', 'keywords_search': '  '}
+    assert plan_imap_query(filters).criteria == []
+
+    query = plan_imap_query(dict(filters, server_search=True))
+    assert query.criteria == ['(BODY "smith")', '(OR BODY "graph" SUBJECT "graph")']
+
+
+def test_signature_changes_with_criteria():
+    base = plan_imap_query({'date_from': date(2024, 1, 1), 'date_to': None})
+    narrowed = plan_imap_query({'date_from': date(2024, 1, 1), 'date_to': None, 'from_search': 'x'})
+    assert base.signature() == '(SINCE 1-Jan-2024)'
+    assert base.signature() != narrowed.signature()
+    assert base.signature(multi_doi=True) == '(SINCE 1-Jan-2024) [multi-doi]'
+    assert base.signature(prefilter=False) == '(SINCE 1-Jan-2024) [no-prefilter]'
+
+
+def test_matches_checks_sender_and_subject_locally():
+    query = IMAPQuery(from_search='Journal.org', subject_search='issue')
+    assert query.matches({'from': 'alerts@journal.org', 'subject': 'New Issue 5'})
+    assert not query.matches({'from': 'alerts@journal.org', 'subject': 'Call for papers'})
+    assert not query.matches({'from': None, 'subject': 'issue'})
+    assert IMAPQuery().matches({})
+
+
+def test_matches_sender_by_display_name():
+    msg = MailMessage.from_bytes(b'From: "Ivan Petrov" <ivan@example.org>\r\nSubject: x\r\n\r\n10.1000/a')
+    fields = _message_fields(msg, '1', 'INBOX', None, None)
+    assert IMAPQuery(from_search='Ivan Petrov').matches(fields)
+    assert IMAPQuery(from_search='ivan@example').matches(fields)
+    assert not IMAPQuery(from_search='Sidorov').matches(fields)
@@ -0,0 +1,14 @@
+from components.publication_store import PublicationStore
+
+
+def test_load_publications_by_folder(tmp_path):
+    store = PublicationStore(str(tmp_path / "store.db"))
+    state = {'uidvalidity': 7, 'last_uid': 2, 'criteria': ''}
+    store.save_folder('me', 'INBOX', [{'uid': '1', 'DO': '10.1000/a'}, {'uid': '2', 'DO': '10.1000/b'}], state)
+    store.save_folder('me', 'Sent', [{'uid': '1', 'DO': '10.1000/c'}], state)
+    store.save_folder('other', 'INBOX', [{'uid': '5', 'DO': '10.1000/d'}])
+
+    assert [p['DO'] for p in store.load_publications('me')] == ['10.1000/a', '10.1000/b', '10.1000/c']
+    assert [p['DO'] for p in store.load_publications('me', ['Sent'])] == ['10.1000/c']
+    assert store.load_publications('me', []) == []
+    assert store.load_sync_state('me') == {'INBOX': state, 'Sent': state}
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from utils import response_cache
+from utils.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setitem(response_cache.CACHE_CONFIG, "max_bytes", 1000)
+    monkeypatch.setitem(response_cache.CACHE_CONFIG, "low_water", 0.5)
+    monkeypatch.setitem(response_cache.CACHE_CONFIG, "evict_batch", 3)
+    monkeypatch.setitem(response_cache.CACHE_CONFIG, "touch_batch", 2)
+    return ResponseCache(str(tmp_path / "cache.db"))
+
+
+def stored_bytes(cache):
+    return cache._count_bytes(cache._connection())
+
+
+def test_get_set_and_missing(cache):
+    assert cache.get('crossref', 'a') == (False, None)
+    cache.set('crossref', 'a', {'title': 'Заголовок'})
+    cache.set('crossref', 'gone', None)
+    assert cache.get('crossref', 'a') == (True, {'title': 'Заголовок'})
+    assert cache.get('crossref', 'gone') == (True, None)
+
+
+def test_running_total_follows_replacements(cache):
+    cache.set('openalex', 'a', 'x' * 100)
+    cache.set('openalex', 'a', 'x' * 10)
+    cache.set('openalex', 'b', None)
+    assert cache._total == stored_bytes(cache) == 12
+
+
+def test_eviction_goes_down_to_low_water_and_keeps_recent(cache):
+    for i in range(9):
+        cache.set('crossref', f'k{i}', 'x' * 98)
+        # k0 читается постоянно и не вытесняется
+        cache.get('crossref', 'k0')
+        time.sleep(0.002)
+    cache.set('crossref', 'k9', 'x' * 98)
+    cache.set('crossref', 'k10', 'x' * 98)
+
+    assert cache._total == stored_bytes(cache) <= 1000
+    assert cache.get('crossref', 'k0')[0]
+    assert not cache.get('crossref', 'k1')[0]
+    assert cache.get('crossref', 'k10')[0]
+
+
+def test_expired_entries_are_dropped(cache, monkeypatch):
+    cache.set('crossref', 'old', 'x' * 10)
+    monkeypatch.setitem(response_cache.CACHE_CONFIG, "ttl", {'crossref': -1})
+    assert cache.get('crossref', 'old') == (False, None)
+    assert cache._total == stored_bytes(cache) == 0
+
+
+def test_clear_source(cache):
+    cache.set('crossref', 'a', 1)
+    cache.set('openalex', 'a', 1)
+    cache.clear('crossref')
+    assert not cache.get('crossref', 'a')[0]
+    assert cache.get('openalex', 'a')[0]
+    assert cache._total == stored_bytes(cache)
+
+
+def test_concurrent_writers_keep_total_in_sync(cache):
+    def write(worker):
+        for i in range(30):
+            cache.set('openalex', f'{worker}-{i}', 'x' * 48)
+            cache.get('openalex', f'{worker}-{i // 2}')
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cache._evict()
+    assert cache._total == stored_bytes(cache) <= 1000
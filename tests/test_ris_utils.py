@@ -0,0 +1,60 @@
+from components.message_parser import _split_references
+from utils.ris_utils import build_ris, scan_body, split_ris_records, tokenize_ris
+
+DIGEST = """New articles 10.9999/free
+TY  - JOUR
+TI  - First
+DO  - 10.1000/one
+CR  - Cited work 10.5555/cited
+ER  -
+TY  - BOOK
+TI  - Second
+  continued
+DO  - 10.5555/cited
+ER  -
+See also 10.7777/tail
+"""
+
+
+def test_scan_body_marks_record_boundaries():
+    pairs, dois = scan_body(DIGEST)
+    assert ('ER', '') in pairs
+    assert dois == ['10.9999/free', '10.1000/one', '10.5555/cited', '10.7777/tail']
+
+
+def test_split_ris_records():
+    pairs, _ = scan_body(DIGEST)
+    blocks = split_ris_records(pairs)
+    assert len(blocks) == 2
+    assert build_ris(blocks[0])['TI'] == 'First'
+    assert build_ris(blocks[1])['TI'] == 'Second continued'
+    assert split_ris_records([]) == []
+    # Последний блок без ER тоже считается записью
+    assert split_ris_records([('TY', 'JOUR'), ('ER', ''), ('TY', 'BOOK')]) == [[('TY', 'JOUR')], [('TY', 'BOOK')]]
+
+
+def test_tokenize_without_boundaries():
+    pairs = tokenize_ris(DIGEST)
+    assert ('ER', '') not in pairs
+    assert pairs[0] == ('TY', 'JOUR')
+
+
+def test_digest_references_skip_dois_inside_blocks():
+    pairs, dois = scan_body(DIGEST)
+    records = _split_references({'uid': '1'}, pairs, dois)
+    assert [(r['doi'], r['ref']) for r in records] == [
+        ('10.1000/one', 0), ('10.5555/cited', 1), ('10.9999/free', 2), ('10.7777/tail', 3),
+    ]
+    assert records[1]['TI'] == 'Second continued'
+    assert records[2]['ris'] == {}
+
+
+def test_digest_pdfs_and_blocks_without_do():
+    text = "TY  - JOUR\nUR  - https://doi.org/10.1000/cited\nER  -\nFree 10.1000/one and 10.1000/two\n"
+    pairs, dois = scan_body(text)
+    fields = {'uid': '1', 'pdf_attachments': [{'filename': 'digest.pdf'}]}
+    records = _split_references(fields, pairs, dois)
+    # Блок без DO не берет DOI из своего текста и не дает записи
+    assert [r['doi'] for r in records] == ['10.1000/one', '10.1000/two']
+    assert records[0]['pdf_attachments'] == [{'filename': 'digest.pdf'}]
+    assert records[1]['pdf_attachments'] == []
@@ -0,0 +1,44 @@
+"""
+Нормализация дат писем
+Дата разбирается один раз при загрузке: datetime с часовым поясом
+и целая метка времени (секунды Unix) для сортировки и границ периода
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# imap_tools возвращает эту дату, если заголовок Date не разобран
+UNKNOWN_EMAIL_DATE = datetime(1900, 1, 1)
+
+
+def normalize_email_date(value: Any) -> Optional[datetime]:
+    """Дата письма как datetime с часовым поясом (без пояса считается UTC)"""
+    if isinstance(value, str):
+        if not value.strip():
+            return None
+        try:
+            from dateutil import parser
+            value = parser.parse(value)
+        except (ValueError, OverflowError):
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        if value == UNKNOWN_EMAIL_DATE:
+            return None
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def to_timestamp(value: Optional[datetime]) -> Optional[int]:
+    """Метка времени Unix для datetime с часовым поясом"""
+    return int(value.timestamp()) if value is not None else None
+
+
+def normalize_publication_date(pub: Dict[str, Any]) -> Dict[str, Any]:
+    """Заполнение полей date и date_ts записи, сохраненной без date_ts"""
+    if 'date_ts' not in pub:
+        date = normalize_email_date(pub.get('date'))
+        pub['date'] = date
+        pub['date_ts'] = to_timestamp(date)
+    return pub
@@ -0,0 +1,39 @@
+"""
+Поиск DOI в тексте
+Один заранее скомпилированный шаблон и быстрая проверка подстроки "10."
+"""
+
+import re
+from typing import List, Optional
+
+from config import DOI_PATTERN
+
+# Шаблон стандартного DOI находит его и внутри ссылок doi.org/...
+DOI_RE = re.compile(DOI_PATTERN, re.IGNORECASE)
+DOI_EXACT_RE = re.compile(r'^10\.\d{4,9}/[-._;()/:A-Z0-9]+$', re.IGNORECASE)
+
+# Любой DOI начинается с этой подстроки
+DOI_PREFIX = "10."
+
+
+def find_doi(text: str) -> Optional[str]:
+    """Первый DOI в тексте"""
+    if not text or DOI_PREFIX not in text:
+        return None
+    match = DOI_RE.search(text)
+    return match.group(0) if match else None
+
+
+def find_all_dois(text: str, unique: bool = True) -> List[str]:
+    """Все DOI в тексте в порядке появления (по умолчанию без повторов)"""
+    if not text or DOI_PREFIX not in text:
+        return []
+    dois = DOI_RE.findall(text)
+    if unique:
+        dois = list(dict.fromkeys(dois))
+    return dois
+
+
+def is_doi(doi: str) -> bool:
+    """Проверка, что строка целиком является DOI"""
+    return bool(doi) and DOI_EXACT_RE.match(doi) is not None
@@ -2,10 +2,11 @@
 Утилиты для работы с DOI
 """
 
-import re
-import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from config import API_CONFIG
+from utils.http_client import http_get
+from utils.doi_matcher import find_doi, find_all_dois, is_doi
+from utils.response_cache import get_response_cache
 import streamlit as st
 
 class DOIUtils:
@@ -13,23 +14,13 @@ class DOIUtils:
 
     @staticmethod
     def extract_doi_from_text(text: str) -> Optional[str]:
-        """Извлечение первого DOI из текста"""
-        if not text:
-            return None
-
-        # Расширенный паттерн для поиска DOI
-        patterns = [
-            r'\b(10\.\d{4,9}/[-._;()/:A-Z0-9]+)\b',  # Стандартный DOI
-            r'doi\.org/(10\.\d{4,9}/[-._;()/:A-Z0-9]+)',  # URL doi.org
-            r'https?://doi\.org/(10\.\d{4,9}/[-._;()/:A-Z0-9]+)',  # Полный URL
-        ]
-
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                return matches[0]
+        """Извлечение первого DOI из текста (в том числе из ссылок doi.org)"""
+        return find_doi(text)
 
-        return None
+    @staticmethod
+    def extract_all_dois_from_text(text: str) -> List[str]:
+        """Извлечение всех различных DOI из текста"""
+        return find_all_dois(text)
 
     @staticmethod
     def clean_doi(doi: str) -> str:
@@ -63,8 +54,12 @@ class DOIUtils:
         clean_doi = DOIUtils.clean_doi(doi)
 
         # Проверяем по паттерну
-        pattern = r'^10\.\d{4,9}/[-._;()/:A-Z0-9]+$'
-        return bool(re.match(pattern, clean_doi, re.IGNORECASE))
+        return is_doi(clean_doi)
+
+    @staticmethod
+    def cache_key(doi: str) -> str:
+        """Ключ ответа Crossref в кэше"""
+        return f"works/{DOIUtils.clean_doi(doi).lower()}"
 
     @staticmethod
     def get_crossref_data(doi: str) -> Optional[Dict[str, Any]]:
@@ -74,19 +69,36 @@ class DOIUtils:
         if not DOIUtils.validate_doi(clean_doi):
             return None
 
-        url = f"{API_CONFIG['crossref_base_url']}/works/{clean_doi}"
-        headers = {'User-Agent': API_CONFIG['user_agent']}
+        found, cached = get_response_cache().get('crossref', DOIUtils.cache_key(clean_doi))
+        if found:
+            return cached
 
         try:
-            response = requests.get(url, headers=headers, timeout=20)
-            if response.status_code == 200:
-                return response.json().get('message')
-            return None
+            return DOIUtils.fetch_crossref_data(clean_doi)
 
         except Exception as e:
             st.warning(f"Ошибка запроса к Crossref: {e}")
             return None
 
+    @staticmethod
+    def fetch_crossref_data(doi: str) -> Optional[Dict[str, Any]]:
+        """
+        Запрос к Crossref API без проверки кэша; ответ сохраняется в кэш.
+        Ошибки сети не перехватываются: функция вызывается и из рабочих потоков
+        """
+        clean_doi = DOIUtils.clean_doi(doi)
+        cache_key = DOIUtils.cache_key(clean_doi)
+        url = f"{API_CONFIG['crossref_base_url']}/works/{clean_doi}"
+
+        response = http_get(url, timeout=20)
+        if response.status_code == 200:
+            message = response.json().get('message')
+            get_response_cache().set('crossref', cache_key, message)
+            return message
+        if response.status_code == 404:
+            get_response_cache().set('crossref', cache_key, None)
+        return None
+
     @staticmethod
     def format_crossref_to_ris(crossref_data: Dict[str, Any]) -> Dict[str, Any]:
         """Конвертация данных Crossref в RIS формат"""
@@ -0,0 +1,207 @@
+"""
+Асинхронное обогащение публикаций метаданными Crossref и OpenAlex
+Ограниченная параллельность, лимиты запросов по хостам, прогресс и отмена.
+Движок не обращается к Streamlit: ошибки запросов копятся в errors,
+а фоновое задание EnrichmentJob отдает результаты скрипту при опросе
+"""
+
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from config import ENRICHMENT_CONFIG
+from utils.doi_utils import DOIUtils
+from utils.openalex_utils import OpenAlexUtils
+from utils.response_cache import get_response_cache
+
+
+class AsyncRateLimiter:
+    """Равномерное распределение запросов к одному хосту: не чаще rate в секунду"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(loop.time(), self._next) + self.interval
+
+
+class EnrichmentEngine:
+    """Класс для массового получения метаданных по DOI"""
+
+    def __init__(self, concurrency: Optional[int] = None, rate_limits: Optional[Dict[str, float]] = None):
+        self.concurrency = concurrency or ENRICHMENT_CONFIG["concurrency"]
+        self.rate_limits = rate_limits or ENRICHMENT_CONFIG["rate_limits"]
+        # Ошибки запросов последнего запуска (показываются вызывающим кодом)
+        self.errors: List[str] = []
+
+    def run(self, dois: List[str],
+            on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+            on_progress: Optional[Callable[[int, int], None]] = None,
+            cancel_event: Optional[threading.Event] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Обогащение списка DOI. Для каждого DOI, по которому получены ответы
+        обоих источников, вызывается on_result(doi, ris), где ris - RIS поля
+        Crossref, дополненные полями OpenAlex. Колбэки вызываются в
+        вызывающем потоке. Установка cancel_event прерывает обработку.
+        """
+        unique = []
+        for doi in dois:
+            clean_doi = OpenAlexUtils.normalize_doi(doi)
+            if clean_doi and clean_doi not in unique:
+                unique.append(clean_doi)
+        self.errors = []
+        if not unique:
+            return {}
+        return asyncio.run(self._run(unique, on_result, on_progress, cancel_event))
+
+    async def _run(self, dois: List[str], on_result, on_progress, cancel_event) -> Dict[str, Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        crossref_limiter = AsyncRateLimiter(self.rate_limits["crossref"])
+        openalex_limiter = AsyncRateLimiter(self.rate_limits["openalex"])
+
+        crossref: Dict[str, Dict[str, Any]] = {}
+        openalex: Dict[str, Dict[str, Any]] = {}
+        pending = {doi: 2 for doi in dois}
+        results: Dict[str, Dict[str, Any]] = {}
+
+        tasks = [
+            asyncio.ensure_future(self._crossref(doi, semaphore, crossref_limiter))
+            for doi in dois
+        ]
+        batch_size = ENRICHMENT_CONFIG["openalex_batch_size"]
+        tasks += [
+            asyncio.ensure_future(self._openalex(dois[start:start + batch_size], semaphore, openalex_limiter))
+            for start in range(0, len(dois), batch_size)
+        ]
+
+        try:
+            waiting = set(tasks)
+            while waiting:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    source, batch = future.result()
+                    (crossref if source == 'crossref' else openalex).update(batch)
+
+                    for doi in batch:
+                        pending[doi] -= 1
+                        if pending[doi]:
+                            continue
+                        ris = dict(crossref.get(doi, {}))
+                        for tag, value in openalex.get(doi, {}).items():
+                            if value and not ris.get(tag):
+                                ris[tag] = value
+                        results[doi] = ris
+                        if on_result:
+                            on_result(doi, ris)
+
+                if on_progress:
+                    on_progress(len(results), len(dois))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return results
+
+    async def _crossref(self, doi: str, semaphore: asyncio.Semaphore,
+                        limiter: AsyncRateLimiter):
+        async with semaphore:
+            # Ответы из кэша не расходуют лимит запросов и не уходят в поток
+            found, data = get_response_cache().get('crossref', DOIUtils.cache_key(doi))
+            if not found:
+                await limiter.wait()
+                try:
+                    data = await asyncio.to_thread(DOIUtils.fetch_crossref_data, doi)
+                except Exception as e:
+                    self.errors.append(f"Crossref {doi}: {e}")
+                    data = None
+        return 'crossref', {doi: DOIUtils.format_crossref_to_ris(data) if data else {}}
+
+    async def _openalex(self, batch: List[str], semaphore: asyncio.Semaphore,
+                        limiter: AsyncRateLimiter):
+        async with semaphore:
+            cache = get_response_cache()
+            works = {}
+            missing = []
+            for doi in batch:
+                found, work = cache.get('openalex', OpenAlexUtils.cache_key(doi))
+                if found:
+                    works[doi] = work
+                else:
+                    missing.append(doi)
+            if missing:
+                await limiter.wait()
+                try:
+                    works.update(await asyncio.to_thread(OpenAlexUtils.fetch_works_by_dois, missing))
+                except Exception as e:
+                    self.errors.append(f"OpenAlex ({len(missing)} DOI): {e}")
+        return 'openalex', {
+            doi: OpenAlexUtils.format_work_to_ris(works.get(doi)) if works.get(doi) else {}
+            for doi in batch
+        }
+
+
+class EnrichmentJob:
+    """
+    Класс фонового обогащения: движок работает в отдельном потоке, скрипт
+    Streamlit забирает готовые результаты при каждом опросе. Задание хранится
+    в st.session_state, поэтому кнопка остановки на следующем rerun
+    устанавливает тот же cancel_event, который проверяет движок.
+    """
+
+    def __init__(self, dois: List[str], engine: Optional[EnrichmentEngine] = None):
+        self.engine = engine or EnrichmentEngine()
+        self.cancel_event = threading.Event()
+        self.done = 0
+        self.total = len(dois)
+        self.received = 0
+        self.error: Optional[Exception] = None
+        # Публикации, измененные при разборе результатов (ведет вызывающий код)
+        self.changed: List[Dict[str, Any]] = []
+        self._new: List[Tuple[str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._work, args=(list(dois),), daemon=True)
+
+    def start(self) -> "EnrichmentJob":
+        self._thread.start()
+        return self
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def take_results(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Результаты, полученные с прошлого вызова: [(DOI, RIS поля)]"""
+        with self._lock:
+            new, self._new = self._new, []
+        return new
+
+    def _work(self, dois: List[str]):
+        try:
+            self.engine.run(dois, on_result=self._on_result, on_progress=self._on_progress,
+                            cancel_event=self.cancel_event)
+        except Exception as e:
+            self.error = e
+
+    def _on_result(self, doi: str, ris: Dict[str, Any]):
+        with self._lock:
+            self._new.append((doi, ris))
+            self.received += 1
+
+    def _on_progress(self, done: int, total: int):
+        self.done, self.total = done, total
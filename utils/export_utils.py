@@ -0,0 +1,192 @@
+"""
+Потоковая выгрузка публикаций Sci.Net.Node
+Записи пишутся порциями во временный файл (в памяти до EXPORT_CONFIG["spool_bytes"],
+дальше на диске): RIS (при необходимости со сжатием gzip), CSV, Parquet и XLSX
+"""
+
+import gzip
+import tempfile
+from typing import Iterable, Iterator, Tuple, BinaryIO, Dict, Callable
+
+import pandas as pd
+
+from config import EXPORT_CONFIG
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow необязателен: без него нет выгрузки Parquet
+    pa = None
+    pq = None
+
+# Конец записи RIS и пустая строка между записями
+RIS_END = "ER  - \n\n"
+RIS_MIME = "application/x-research-info-systems"
+GZIP_MIME = "application/gzip"
+
+
+def spooled_file() -> BinaryIO:
+    """Временный файл выгрузки: в памяти, пока не превысит spool_bytes"""
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_CONFIG["spool_bytes"], mode='w+b')
+
+
+def as_download(file: BinaryIO) -> bytes:
+    """
+    Содержимое файла выгрузки для st.download_button; файл закрывается.
+    Streamlit все равно держит данные кнопки целиком в памяти
+    (MediaFileManager), поэтому файл читается один раз и сразу удаляется:
+    временный файл ограничивает память только на время записи выгрузки.
+    """
+    with file:
+        file.seek(0)
+        return file.read()
+
+
+class RISExportWriter:
+    """Класс для записи RIS по одной публикации без сборки всего текста в памяти"""
+
+    def __init__(self, compress: bool = False):
+        self.file = spooled_file()
+        self._out = gzip.GzipFile(fileobj=self.file, mode='wb') if compress else self.file
+        self._chunk = []
+        self.records = 0
+
+    def write_record(self, pairs: Iterable[Tuple[str, str]]):
+        """Запись одной публикации: пары (тег, значение) и строка ER"""
+        self._chunk.extend(f"{tag}  - {value}\n" for tag, value in pairs)
+        self._chunk.append(RIS_END)
+        self.records += 1
+        if self.records % EXPORT_CONFIG["ris_chunk_records"] == 0:
+            self._flush()
+
+    def close(self) -> BinaryIO:
+        """Завершение записи; возвращает файл, готовый к чтению с начала"""
+        self._flush()
+        if self._out is not self.file:
+            # Закрывает только поток gzip, сам файл остается открытым
+            self._out.close()
+        self.file.seek(0)
+        return self.file
+
+    def _flush(self):
+        if self._chunk:
+            self._out.write(''.join(self._chunk).encode('utf-8'))
+            self._chunk = []
+
+
+def export_ris(records: Iterable[Iterable[Tuple[str, str]]], compress: bool = False) -> Tuple[BinaryIO, int]:
+    """Выгрузка последовательности записей RIS: (файл, число записей)"""
+    writer = RISExportWriter(compress)
+    for pairs in records:
+        writer.write_record(pairs)
+    return writer.close(), writer.records
+
+
+# Колонки табличной выгрузки и колонки нормализованной таблицы публикаций
+EXPORT_COLUMNS = {
+    'Title': 'title',
+    'Authors': 'authors',
+    'Year': 'year',
+    'Journal': 'journal',
+    'DOI': 'doi',
+    'Type': 'type',
+    'Keywords': 'keywords',
+    'Abstract': 'abstract',
+    'Volume': 'volume',
+    'Issue': 'issue',
+    'Pages': 'pages',
+    'URL': 'url',
+    'Folder': 'folder',
+    'Email_From': 'from',
+    'Email_Date': 'date_ts',
+    'PDF_Count': 'pdf_count',
+}
+
+# Списковые колонки склеиваются в строку
+LIST_SEPARATOR = ', '
+
+
+def export_frame(table: pd.DataFrame) -> pd.DataFrame:
+    """Колонки выгрузки из нормализованной таблицы (векторно, без обхода записей)"""
+    columns = {}
+    for name, column in EXPORT_COLUMNS.items():
+        values = table[column]
+        if column == 'date_ts':
+            values = pd.to_datetime(values, unit='s', utc=True)
+        elif column == 'pdf_count':
+            values = values.astype('int32')
+        elif column in ('authors', 'keywords'):
+            values = values.str.join(LIST_SEPARATOR)
+        else:
+            values = values.astype(str)
+        columns[name] = values.reset_index(drop=True)
+    return pd.DataFrame(columns)
+
+
+def iter_export_chunks(table: pd.DataFrame, chunk_rows: int = None) -> Iterator[pd.DataFrame]:
+    """Колонки выгрузки порциями по chunk_rows строк"""
+    chunk_rows = chunk_rows or EXPORT_CONFIG["chunk_rows"]
+    for start in range(0, len(table), chunk_rows):
+        yield export_frame(table.iloc[start:start + chunk_rows])
+
+
+def export_csv(table: pd.DataFrame) -> BinaryIO:
+    """CSV в UTF-8 с BOM (корректно открывается в Excel)"""
+    file = spooled_file()
+    file.write('\ufeff'.encode('utf-8'))
+    for i, chunk in enumerate(iter_export_chunks(table)):
+        file.write(chunk.to_csv(index=False, header=(i == 0)).encode('utf-8'))
+    file.seek(0)
+    return file
+
+
+def export_parquet(table: pd.DataFrame) -> BinaryIO:
+    """Parquet: каждая порция записывается отдельной группой строк"""
+    if pq is None:
+        raise RuntimeError("Для выгрузки Parquet требуется пакет pyarrow")
+    file = spooled_file()
+    writer = None
+    try:
+        for chunk in iter_export_chunks(table):
+            # Схема берется из первой порции, остальные приводятся к ней
+            schema = writer.schema if writer is not None else None
+            batch = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(file, batch.schema)
+            writer.write_table(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    file.seek(0)
+    return file
+
+
+def export_xlsx(table: pd.DataFrame) -> BinaryIO:
+    """XLSX через потоковый (write-only) режим openpyxl"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Publications")
+    sheet.append(list(EXPORT_COLUMNS))
+    for chunk in iter_export_chunks(table):
+        # Excel не хранит часовой пояс: даты выгружаются в UTC
+        chunk['Email_Date'] = chunk['Email_Date'].dt.tz_localize(None)
+        for row in chunk.astype(object).where(chunk.notna(), None).to_numpy().tolist():
+            sheet.append(row)
+    file = spooled_file()
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+
+# Форматы табличной выгрузки: расширение, MIME тип и функция выгрузки
+TABLE_FORMATS: Dict[str, Tuple[str, str, Callable[[pd.DataFrame], BinaryIO]]] = {
+    'csv': ('csv', 'text/csv', export_csv),
+    'parquet': ('parquet', 'application/vnd.apache.parquet', export_parquet),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', export_xlsx),
+}
+
+
+def available_table_formats() -> list:
+    """Форматы, доступные в текущем окружении"""
+    return [name for name in TABLE_FORMATS if name != 'parquet' or pq is not None]
@@ -0,0 +1,150 @@
+"""
+Потоковое извлечение текста из HTML писем
+За один проход по разметке: текст, DOI-кандидаты и строки RIS
+(lxml, если установлен, иначе стандартный html.parser)
+"""
+
+from html import escape
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+from utils.ris_utils import RISLineScanner
+
+try:
+    from lxml import etree
+except ImportError:  # lxml необязателен
+    etree = None
+
+# Теги, начало и конец которых переводят строку
+BLOCK_TAGS = frozenset([
+    'br', 'p', 'div', 'tr', 'li', 'ul', 'ol', 'table', 'blockquote', 'pre', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'dd', 'section', 'article', 'header', 'footer',
+])
+# Ячейки таблиц отделяются пробелом
+CELL_TAGS = frozenset(['td', 'th'])
+# Содержимое этих тегов не является текстом письма
+SKIP_TAGS = frozenset(['script', 'style', 'head', 'title'])
+
+
+class _TextCollector:
+    """
+    Приемник событий разбора (интерфейс target парсера lxml).
+    Завершенные строки сразу уходят в сканеры RIS: по тексту и по строке
+    с сохраненными ссылками <a href>, как их показывает MainPanel.
+    """
+
+    def __init__(self, boundaries: bool = False):
+        self.dois: List[str] = []
+        self.text_scanner = RISLineScanner(boundaries=boundaries, dois=self.dois)
+        self.html_scanner = RISLineScanner(boundaries=boundaries)
+        self.lines: List[str] = []
+        self._text: List[str] = []
+        self._html: List[str] = []
+        self._skip = 0
+
+    def start(self, tag: str, attrib):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag in BLOCK_TAGS:
+            self._newline()
+        elif tag in CELL_TAGS:
+            self._text.append(' ')
+            self._html.append(' ')
+        elif tag == 'a':
+            href = dict(attrib).get('href')
+            if href:
+                self._html.append(f'<a href="{escape(href)}">')
+
+    def end(self, tag: str):
+        tag = tag.lower()
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in BLOCK_TAGS:
+            self._newline()
+        elif tag == 'a':
+            self._html.append('</a>')
+
+    def data(self, data: str):
+        if self._skip or not data:
+            return
+        parts = data.split('\n')
+        for i, part in enumerate(parts):
+            if i:
+                self._newline()
+            if part:
+                self._text.append(part)
+                self._html.append(escape(part, quote=False))
+
+    def close(self) -> str:
+        self._newline()
+        return '\n'.join(self.lines)
+
+    def _newline(self):
+        if not self._text and not self._html:
+            return
+        line = ''.join(self._text)
+        self.lines.append(line)
+        self.text_scanner.feed(line)
+        self.html_scanner.feed(''.join(self._html))
+        self._text = []
+        self._html = []
+
+
+class _StdlibParser(HTMLParser):
+    """Адаптер html.parser к интерфейсу _TextCollector"""
+
+    def __init__(self, target: _TextCollector):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def _collect(html: str, boundaries: bool = False) -> Tuple[str, _TextCollector]:
+    if etree is not None:
+        collector = _TextCollector(boundaries)
+        try:
+            parser = etree.HTMLParser(target=collector)
+            parser.feed(html)
+            return parser.close(), collector
+        except Exception:
+            # Неразборчивая для lxml разметка - повторяем стандартным парсером
+            pass
+
+    collector = _TextCollector(boundaries)
+    parser = _StdlibParser(collector)
+    parser.feed(html)
+    parser.close()
+    return collector.close(), collector
+
+
+def html_to_text(html: str) -> str:
+    """Текст HTML без тегов; блочные теги и <br> переводят строку"""
+    if not html:
+        return ""
+    return _collect(html)[0]
+
+
+def scan_html(html: str, boundaries: bool = False) -> Tuple[str, List[Tuple[str, str]], List[Tuple[str, str]], List[str]]:
+    """
+    Один проход по HTML: (текст, пары RIS по тексту, пары RIS со ссылками
+    <a href>, все различные DOI в порядке появления). С boundaries пары
+    содержат границы записей ("ER", "")
+    """
+    if not html:
+        return "", [], [], []
+    text, collector = _collect(html, boundaries)
+    return (
+        text,
+        collector.text_scanner.close(),
+        collector.html_scanner.close(),
+        list(dict.fromkeys(collector.dois)),
+    )
@@ -0,0 +1,77 @@
+"""
+Общий HTTP клиент для Crossref и OpenAlex
+Один requests.Session с пулом keep-alive соединений и повторами на 429/5xx.
+Контактный адрес (mailto) передается в User-Agent и параметром запроса:
+так запросы попадают в вежливый пул OpenAlex и следуют этикету Crossref
+"""
+
+import threading
+from typing import Optional, Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import API_CONFIG, HTTP_CONFIG
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_contact_email: str = API_CONFIG["mailto"]
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_CONFIG["max_retries"],
+        backoff_factor=HTTP_CONFIG["backoff_factor"],
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_CONFIG["pool_connections"],
+        pool_maxsize=HTTP_CONFIG["pool_maxsize"],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'User-Agent': _user_agent()})
+    return session
+
+
+def _user_agent() -> str:
+    """User-Agent вида "SciNetNode/1.0 (https://...; mailto:адрес)" """
+    user_agent = API_CONFIG['user_agent']
+    if not _contact_email:
+        return user_agent
+    if user_agent.endswith(')'):
+        return f"{user_agent[:-1]}; mailto:{_contact_email})"
+    return f"{user_agent} (mailto:{_contact_email})"
+
+
+def set_contact_email(email: Optional[str]):
+    """Контактный адрес запросов, если он не задан в API_CONFIG["mailto"]"""
+    global _contact_email
+    if API_CONFIG["mailto"] or not email:
+        return
+    _contact_email = email
+    if _session is not None:
+        _session.headers['User-Agent'] = _user_agent()
+
+
+def get_session() -> requests.Session:
+    """Общий для процесса Session (создается при первом обращении)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def http_get(url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 20) -> requests.Response:
+    """GET запрос через общий пул соединений"""
+    if _contact_email:
+        params = dict(params or {}, mailto=_contact_email)
+    return get_session().get(url, params=params, timeout=timeout)
@@ -2,9 +2,11 @@
 Утилиты для работы с OpenAlex API
 """
 
-import requests
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Iterator
 from config import API_CONFIG
+from utils.http_client import http_get
+from utils.response_cache import get_response_cache
 import streamlit as st
 
 class OpenAlexUtils:
@@ -17,21 +19,122 @@ class OpenAlexUtils:
             return None
 
         # Очищаем DOI
-        clean_doi = doi.replace('https://doi.org/', '').replace('http://doi.org/', '')
-        url = f"{API_CONFIG['openalex_base_url']}/works/https://doi.org/{clean_doi}"
-
-        headers = {'User-Agent': API_CONFIG['user_agent']}
+        clean_doi = OpenAlexUtils.normalize_doi(doi)
+        found, cached = get_response_cache().get('openalex', OpenAlexUtils.cache_key(clean_doi))
+        if found:
+            return cached
 
         try:
-            response = requests.get(url, headers=headers, timeout=20)
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return OpenAlexUtils.fetch_work_by_doi(clean_doi)
 
         except Exception as e:
             st.warning(f"Ошибка запроса к OpenAlex: {e}")
             return None
 
+    @staticmethod
+    def fetch_work_by_doi(doi: str) -> Optional[Dict[str, Any]]:
+        """Запрос работы по DOI без проверки кэша; ошибки сети не перехватываются"""
+        clean_doi = OpenAlexUtils.normalize_doi(doi)
+        cache_key = OpenAlexUtils.cache_key(clean_doi)
+        url = f"{API_CONFIG['openalex_base_url']}/works/https://doi.org/{clean_doi}"
+
+        response = http_get(url, timeout=20)
+        if response.status_code == 200:
+            work = response.json()
+            get_response_cache().set('openalex', cache_key, work)
+            return work
+        if response.status_code == 404:
+            get_response_cache().set('openalex', cache_key, None)
+        return None
+
+    @staticmethod
+    def normalize_doi(doi: str) -> str:
+        """Приведение DOI к виду 10.xxxx/yyy в нижнем регистре"""
+        if not doi:
+            return ""
+        clean_doi = str(doi).strip()
+        for prefix in ('https://doi.org/', 'http://doi.org/', 'https://dx.doi.org/', 'http://dx.doi.org/',
+                       'doi.org/', 'DOI:', 'doi:'):
+            if clean_doi.lower().startswith(prefix.lower()):
+                clean_doi = clean_doi[len(prefix):]
+        return clean_doi.strip().lower()
+
+    @staticmethod
+    def cache_key(doi: str) -> str:
+        """Ключ работы OpenAlex в кэше"""
+        return f"works/{OpenAlexUtils.normalize_doi(doi)}"
+
+    @staticmethod
+    def get_works_by_dois(dois: List[str], batch_size: int = 50) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Пакетное получение работ по списку DOI: до batch_size DOI за один
+        запрос через фильтр doi:a|b|c. Возвращает словарь
+        {нормализованный DOI: работа или None, если работа не найдена}
+        """
+        normalized = []
+        for doi in dois:
+            clean_doi = OpenAlexUtils.normalize_doi(doi)
+            if clean_doi and clean_doi not in normalized:
+                normalized.append(clean_doi)
+
+        works: Dict[str, Optional[Dict[str, Any]]] = {doi: None for doi in normalized}
+
+        # Сначала отвечаем из кэша, в сеть идут только промахи
+        cache = get_response_cache()
+        pending = []
+        for doi in normalized:
+            found, cached = cache.get('openalex', OpenAlexUtils.cache_key(doi))
+            if found:
+                works[doi] = cached
+            else:
+                pending.append(doi)
+
+        try:
+            works.update(OpenAlexUtils.fetch_works_by_dois(pending, batch_size))
+        except Exception as e:
+            st.warning(f"Ошибка пакетного запроса к OpenAlex: {e}")
+
+        return works
+
+    @staticmethod
+    def fetch_works_by_dois(dois: List[str], batch_size: int = 50) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Пакетный запрос работ по нормализованным DOI без проверки кэша;
+        ответы сохраняются в кэш. Ошибки сети не перехватываются:
+        функция вызывается и из рабочих потоков
+        """
+        cache = get_response_cache()
+        works: Dict[str, Optional[Dict[str, Any]]] = {doi: None for doi in dois}
+
+        # DOI с разделителями фильтра OpenAlex запрашиваем по одному
+        batchable = [doi for doi in dois if '|' not in doi and ',' not in doi]
+        for doi in dois:
+            if doi not in batchable:
+                works[doi] = OpenAlexUtils.fetch_work_by_doi(doi)
+
+        url = f"{API_CONFIG['openalex_base_url']}/works"
+        batch_size = max(1, min(batch_size, 50))
+
+        for start in range(0, len(batchable), batch_size):
+            batch = batchable[start:start + batch_size]
+            params = {
+                'filter': 'doi:' + '|'.join(batch),
+                'per-page': batch_size
+            }
+
+            response = http_get(url, params=params, timeout=30)
+            if response.status_code != 200:
+                continue
+            for work in response.json().get('results', []):
+                work_doi = OpenAlexUtils.normalize_doi(work.get('doi'))
+                if work_doi in works:
+                    works[work_doi] = work
+            # Найденные и отсутствующие в OpenAlex работы кэшируются одинаково
+            for doi in batch:
+                cache.set('openalex', OpenAlexUtils.cache_key(doi), works[doi])
+
+        return works
+
     @staticmethod
     def get_concepts_for_text(title: str, abstract: str = "") -> List[Dict[str, Any]]:
         """Получение концептов для текста через OpenAlex"""
@@ -44,10 +147,8 @@ class OpenAlexUtils:
         if abstract:
             params['abstract'] = abstract
 
-        headers = {'User-Agent': API_CONFIG['user_agent']}
-
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=15)
+            response = http_get(url, params=params, timeout=15)
             if response.status_code == 200:
                 data = response.json()
                 return data.get('concepts', [])
@@ -78,6 +179,46 @@ class OpenAlexUtils:
 
         return sankey_data
 
+    @staticmethod
+    def iter_works(params: Dict[str, Any], max_results: Optional[int] = None,
+                   max_seconds: Optional[float] = None, per_page: int = 200) -> Iterator[Dict[str, Any]]:
+        """
+        Постраничный обход списка работ OpenAlex по курсору (cursor=*).
+        Работы отдаются по мере получения страниц; обход ограничивается
+        числом работ max_results и/или временем max_seconds.
+        """
+        url = f"{API_CONFIG['openalex_base_url']}/works"
+        params = dict(params)
+        params['per-page'] = max(1, min(per_page, 200))
+        cursor = '*'
+        count = 0
+        started = time.monotonic()
+
+        while cursor:
+            if max_results is not None:
+                if count >= max_results:
+                    return
+                params['per-page'] = max(1, min(params['per-page'], max_results - count))
+            if max_seconds is not None and time.monotonic() - started > max_seconds:
+                return
+
+            params['cursor'] = cursor
+            response = http_get(url, params=params, timeout=30)
+            if response.status_code != 200:
+                return
+            data = response.json()
+            results = data.get('results', [])
+            if not results:
+                return
+
+            for work in results:
+                yield work
+                count += 1
+                if max_results is not None and count >= max_results:
+                    return
+
+            cursor = data.get('meta', {}).get('next_cursor')
+
     @staticmethod
     def search_works_by_concepts(concept_ids: List[str], limit: int = 50) -> List[Dict[str, Any]]:
         """Поиск работ по концептам"""
@@ -86,48 +227,42 @@ class OpenAlexUtils:
 
         # Формируем фильтр по концептам
         concepts_filter = '|'.join(concept_ids)
-        url = f"{API_CONFIG['openalex_base_url']}/works"
-
         params = {
             'filter': f'concepts.id:{concepts_filter}',
-            'per-page': limit,
             'sort': 'cited_by_count:desc'
         }
 
-        headers = {'User-Agent': API_CONFIG['user_agent']}
-
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=20)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('results', [])
-            return []
+            return list(OpenAlexUtils.iter_works(params, max_results=limit))
 
         except Exception as e:
             st.warning(f"Ошибка поиска работ: {e}")
             return []
 
     @staticmethod
-    def get_citations_for_work(work_id: str) -> List[Dict[str, Any]]:
-        """Получение цитирований для работы"""
+    def iter_citations_for_work(work_id: str, max_results: Optional[int] = None,
+                                max_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Потоковое получение всех цитирующих работ"""
         if not work_id:
-            return []
+            return iter(())
 
-        url = f"{API_CONFIG['openalex_base_url']}/works"
         params = {
             'filter': f'cites:{work_id}',
-            'per-page': 100,
             'sort': 'publication_date:desc'
         }
+        return OpenAlexUtils.iter_works(params, max_results=max_results, max_seconds=max_seconds)
 
-        headers = {'User-Agent': API_CONFIG['user_agent']}
+    @staticmethod
+    def get_citations_for_work(work_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Получение цитирований для работы, не больше limit.
+        Все цитирования - потоком через iter_citations_for_work
+        """
+        if not work_id:
+            return []
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=20)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('results', [])
-            return []
+            return list(OpenAlexUtils.iter_citations_for_work(work_id, max_results=limit))
 
         except Exception as e:
             st.warning(f"Ошибка получения цитирований: {e}")
@@ -195,26 +330,26 @@ class OpenAlexUtils:
         return ris_data
 
     @staticmethod
-    def get_author_works(author_id: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Получение работ автора"""
+    def iter_author_works(author_id: str, max_results: Optional[int] = None,
+                          max_seconds: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Потоковое получение работ автора"""
         if not author_id:
-            return []
+            return iter(())
 
-        url = f"{API_CONFIG['openalex_base_url']}/works"
         params = {
             'filter': f'authorships.author.id:{author_id}',
-            'per-page': limit,
             'sort': 'publication_date:desc'
         }
+        return OpenAlexUtils.iter_works(params, max_results=max_results, max_seconds=max_seconds)
 
-        headers = {'User-Agent': API_CONFIG['user_agent']}
+    @staticmethod
+    def get_author_works(author_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Получение работ автора"""
+        if not author_id:
+            return []
 
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=20)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('results', [])
-            return []
+            return list(OpenAlexUtils.iter_author_works(author_id, max_results=limit))
 
         except Exception as e:
             st.warning(f"Ошибка получения работ автора: {e}")
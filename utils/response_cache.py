@@ -0,0 +1,199 @@
+"""
+Дисковый кэш ответов Crossref и OpenAlex
+SQLite с TTL по источникам, LRU-вытеснением по объему и кэшированием 404
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Any, Tuple, Dict
+
+from config import CACHE_CONFIG
+
+# Признак закэшированного отсутствия записи (404)
+MISSING = None
+
+
+class ResponseCache:
+    """
+    Класс для хранения ответов внешних API между сессиями.
+    У каждого потока свое соединение; объем кэша ведется счетчиком в памяти,
+    время последнего обращения записывается пачками.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CACHE_CONFIG["path"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+        self._local = threading.local()
+        # Отложенные обновления времени обращения: {(source, key): время}
+        self._touched: Dict[Tuple[str, str], float] = {}
+        self._init_schema()
+        self._total = self._count_bytes(self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока (открывается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        # WAL: чтение из потоков обогащения не ждет записи
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    body TEXT,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (source, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _ttl(self, source: str, negative: bool) -> float:
+        if negative:
+            return CACHE_CONFIG["negative_ttl"]
+        return CACHE_CONFIG["ttl"].get(source, CACHE_CONFIG["default_ttl"])
+
+    def get(self, source: str, key: str) -> Tuple[bool, Any]:
+        """
+        Поиск ответа в кэше: (найден ли, значение).
+        Значение None означает закэшированный 404.
+        """
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT body, created, size FROM responses WHERE source = ? AND key = ?", (source, key)
+        ).fetchone()
+        if row is None:
+            return False, None
+
+        body, created, size = row
+        if now - created > self._ttl(source, body is None):
+            with conn:
+                deleted = conn.execute(
+                    "DELETE FROM responses WHERE source = ? AND key = ?", (source, key)
+                ).rowcount
+            if deleted:
+                with self._lock:
+                    self._total -= size
+            return False, None
+
+        with self._lock:
+            self._touched[(source, key)] = now
+            flush = len(self._touched) >= CACHE_CONFIG["touch_batch"]
+        if flush:
+            self.flush()
+        return True, (json.loads(body) if body is not None else MISSING)
+
+    def set(self, source: str, key: str, value: Any):
+        """Сохранение ответа; value=None сохраняет отрицательный результат"""
+        body = json.dumps(value, ensure_ascii=False) if value is not None else None
+        size = len(body.encode('utf-8')) if body is not None else 0
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            old = conn.execute(
+                "SELECT size FROM responses WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (source, key, body, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, key, body, size, now, now)
+            )
+        with self._lock:
+            self._total += size - (old[0] if old else 0)
+            over = self._total > CACHE_CONFIG["max_bytes"]
+        if over:
+            self._evict()
+
+    def flush(self):
+        """Запись накопленных времен обращения"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            with self._connection() as conn:
+                conn.executemany(
+                    "UPDATE responses SET accessed = ? WHERE source = ? AND key = ?",
+                    [(accessed, source, key) for (source, key), accessed in touched.items()]
+                )
+
+    def _evict(self):
+        """
+        Удаление давно не использованных записей пачками до нижней границы
+        объема (low_water от лимита), чтобы не вытеснять при каждой записи.
+        Запросы к базе идут без общей блокировки: чтение и запись из других
+        потоков не ждут вытеснения; одновременно вытесняет один поток
+        """
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            self.flush()
+            conn = self._connection()
+            # Счетчик сверяется с базой: ее могли менять другие процессы
+            total = self._count_bytes(conn)
+            with self._lock:
+                self._total = total
+            target = CACHE_CONFIG["max_bytes"] * CACHE_CONFIG["low_water"]
+            while total > target:
+                batch = conn.execute(
+                    "SELECT source, key, size FROM responses ORDER BY accessed LIMIT ?",
+                    (CACHE_CONFIG["evict_batch"],)
+                ).fetchall()
+                if not batch:
+                    break
+                freed = 0
+                with conn:
+                    for source, key, size in batch:
+                        if conn.execute(
+                            "DELETE FROM responses WHERE source = ? AND key = ?", (source, key)
+                        ).rowcount:
+                            freed += size
+                        total -= size
+                        if total <= target:
+                            break
+                with self._lock:
+                    self._total -= freed
+        finally:
+            self._evict_lock.release()
+
+    def _count_bytes(self, conn: sqlite3.Connection) -> int:
+        (total,) = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return total
+
+    def clear(self, source: Optional[str] = None):
+        """Очистка кэша (целиком или одного источника)"""
+        conn = self._connection()
+        with self._lock:
+            self._touched = {}
+            with conn:
+                if source:
+                    conn.execute("DELETE FROM responses WHERE source = ?", (source,))
+                else:
+                    conn.execute("DELETE FROM responses")
+            self._total = self._count_bytes(conn)
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Общий для процесса кэш ответов"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
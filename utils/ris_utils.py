@@ -0,0 +1,145 @@
+"""
+Утилиты для разбора RIS данных
+Общий однопроходный токенизатор для EmailHandler и RISParser
+"""
+
+import re
+from typing import Dict, List, Any, Tuple, Optional
+
+from utils.doi_matcher import DOI_RE, DOI_PREFIX
+
+# Паттерн для RIS полей: TAG - VALUE или TAG  - VALUE
+RIS_LINE_RE = re.compile(r'^([A-Z0-9]{2})\s*-\s*(.+)$')
+
+# Строка конца ссылки без значения
+ER_LINE_RE = re.compile(r'^ER\s*-\s*$')
+
+# Поля которые могут повторяться
+MULTI_FIELDS = frozenset(['AU', 'KW', 'DE', 'CR', 'A1', 'A2', 'A3'])
+
+
+def tokenize_ris(text: str) -> List[Tuple[str, str]]:
+    """
+    Разбор текста на пары (тег, значение) за один проход по строкам.
+    Строки без тега продолжают значение предыдущего поля.
+    """
+    return _scan(text, boundaries=False, dois=None)
+
+
+def scan_body(text: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Один проход по телу письма: пары RIS с границами записей ("ER", "")
+    и все различные DOI в порядке появления
+    """
+    dois: List[str] = []
+    pairs = _scan(text, boundaries=True, dois=dois)
+    return pairs, list(dict.fromkeys(dois))
+
+
+def split_ris_records(pairs: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+    """Разбиение пар RIS на отдельные ссылки по границам ER"""
+    records = []
+    current: List[Tuple[str, str]] = []
+    for tag, value in pairs:
+        if tag == 'ER':
+            if current:
+                records.append(current)
+            current = []
+        else:
+            current.append((tag, value))
+    if current:
+        records.append(current)
+    return records
+
+
+def _scan(text: str, boundaries: bool, dois: Optional[List[str]]) -> List[Tuple[str, str]]:
+    """Общий проход по строкам; при dois не None собирает в него найденные DOI"""
+    if not text:
+        return []
+
+    scanner = RISLineScanner(boundaries=boundaries, dois=dois)
+    for line in text.split('\n'):
+        scanner.feed(line)
+    return scanner.close()
+
+
+class RISLineScanner:
+    """
+    Потоковый разбор RIS по одной строке: строки подаются через feed
+    по мере появления (например, из разбора HTML), пары забираются close
+    """
+
+    def __init__(self, boundaries: bool = False, dois: Optional[List[str]] = None):
+        self.boundaries = boundaries
+        self.dois = dois
+        self.pairs: List[Tuple[str, str]] = []
+        self._tag = None
+        self._value = ""
+
+    def feed(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+
+        if self.dois is not None and DOI_PREFIX in line:
+            self.dois.extend(DOI_RE.findall(line))
+
+        # Проверяем начало нового RIS поля
+        match = RIS_LINE_RE.match(line)
+        if match:
+            # Сохраняем предыдущее поле если есть
+            self._flush()
+            self._tag, value = match.groups()
+            self._value = value.strip()
+        elif ER_LINE_RE.match(line):
+            # Конец ссылки без значения: "ER  -" не продолжает предыдущее поле
+            self._flush()
+            if self.boundaries:
+                self.pairs.append(('ER', ''))
+        elif self._tag:
+            # Продолжение многострочного поля
+            self._value += " " + line
+
+    def close(self) -> List[Tuple[str, str]]:
+        # Сохраняем последнее поле
+        self._flush()
+        if self.boundaries:
+            # Строка ER со значением тоже граница записи: значение отбрасывается
+            return [('ER', '') if tag == 'ER' else (tag, value) for tag, value in self.pairs]
+        return self.pairs
+
+    def _flush(self):
+        if self._tag:
+            self.pairs.append((self._tag, self._value))
+        self._tag, self._value = None, ""
+
+
+def add_ris_field(ris_data: Dict[str, Any], tag: str, value: str):
+    """Добавление RIS поля в структуру данных с сохранением HTML"""
+    value = value.strip()
+    if not value:
+        return
+
+    if tag in MULTI_FIELDS:
+        values = ris_data.setdefault(tag, [])
+        # Не добавляем дубликаты
+        if value not in values:
+            values.append(value)
+    else:
+        # Для одиночных полей - выбираем наиболее подробное значение
+        if tag not in ris_data or len(value) > len(str(ris_data.get(tag, ''))):
+            ris_data[tag] = value
+
+
+def build_ris(pairs: List[Tuple[str, str]], ris_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Сборка словаря RIS из пар (тег, значение), при необходимости поверх ris_data"""
+    if ris_data is None:
+        ris_data = {}
+    for tag, value in pairs:
+        add_ris_field(ris_data, tag, value)
+    return ris_data
+
+
+def copy_ris(ris_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Копия словаря RIS с отдельными списками повторяющихся полей"""
+    return {tag: list(value) if isinstance(value, list) else value for tag, value in ris_data.items()}